@@ -1,14 +1,51 @@
 from flask import Flask, render_template, request, jsonify
 import os
+import threading
 from flask_cors import CORS
 from src.web.routes import web_bp
 
-# Run startup checks (download models if needed)
-try:
-    from startup import ensure_models_downloaded
-    ensure_models_downloaded()
-except Exception as e:
-    print(f"Startup check failed: {e}")
+
+def run_startup_checks():
+    """Download models if needed."""
+    try:
+        from startup import ensure_models_downloaded
+        ensure_models_downloaded()
+    except Exception as e:
+        print(f"Startup check failed: {e}")
+
+
+def preload_model():
+    """Load the serving model once in the master process, before workers fork.
+
+    Enable with ``PRELOAD_MODEL=1`` and run gunicorn with ``--preload`` so this
+    module is imported (and the model loaded) before forking:
+
+        PRELOAD_MODEL=1 gunicorn --preload -w 4 -b 0.0.0.0:$PORT app:app
+
+    Workers then inherit the loaded model instead of each loading a copy. The
+    compiled scorer's arrays are memory-mapped read-only, so those pages stay
+    shared by every worker; ``gc.freeze()`` keeps the collector from touching
+    (and un-sharing) the preloaded objects in each worker.
+    """
+    import gc
+    from src.ml.pipeline import load_model, load_scorer
+
+    try:
+        if load_scorer() is None:
+            load_model()
+    except Exception as e:
+        print(f"Model preload failed, workers will load on first request: {e}")
+        return
+    gc.freeze()
+
+
+if os.environ.get("PRELOAD_MODEL") == "1":
+    run_startup_checks()
+    preload_model()
+else:
+    # Serve /health straight away; a request that needs the model before the
+    # download finishes waits for it in load_model
+    threading.Thread(target=run_startup_checks, name="startup-checks", daemon=True).start()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Next.js frontend
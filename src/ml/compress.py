@@ -0,0 +1,295 @@
+"""
+Post-training compression of a model version.
+
+Most of the up to 150k n-gram coefficients a training run keeps are close to
+zero. ``compress_version`` prunes the n-grams whose coefficient magnitude is
+below ``min_coef`` and/or keeps only the ``top_n`` largest, exports the
+compiled scorer with ``dtype`` idf and weights (int8 weights carry a per-block
+scale, see ``CompiledScorer.quantized``) and commits the result as a new
+registry version, activated only on request. The vectorizers' ``stop_words_``,
+which only record the n-grams cut at fit time, are dropped as well.
+
+By default a pruned n-gram keeps counting towards a document's TF-IDF norm:
+its coefficient is zeroed and the compiled scorer keeps only its hash and idf,
+so the scores of the remaining n-grams are unchanged. ``drop_from_norm``
+removes pruned n-grams from the vocabularies altogether, which is much
+smaller but renormalises every document, so scores move further.
+
+Accuracy and probability drift are measured on ``eval_csv``, leaving out any
+row whose text is also in the version's training CSV, along with artifact size,
+load time and latency. The final model is refit on every training row, so
+without rows it never saw (e.g. no ``eval_csv``) the drift is measured on the
+80/20 test split of the training CSV instead and reported as training-set
+drift: its probability change is still meaningful, its accuracy is not::
+
+    python -m src.ml.compress --top_n 20000 --dtype int8 --eval_csv fresh_articles.csv
+    python -m src.ml.compress --min_coef 0.05 --dtype float16 --version <version> --activate
+"""
+import copy
+import os
+import time
+
+import numpy as np
+
+from src.ml import registry
+from src.ml.scorer import QUANTIZED_DTYPES, CompiledScorer
+
+
+
+def select_columns(coef, n_word: int, n_char: int, min_coef: float = None, top_n: int = None):
+    """Boolean masks over the word and char columns of ``coef`` that survive pruning."""
+    magnitude = np.abs(np.asarray(coef, dtype=np.float64).ravel()[:n_word + n_char])
+    keep = np.ones(len(magnitude), dtype=bool)
+    if min_coef is not None:
+        keep &= magnitude >= min_coef
+    if top_n is not None and top_n < keep.sum():
+        # Stable sort, so ties are broken the same way on every run
+        order = np.argsort(-np.where(keep, magnitude, -1.0), kind="stable")
+        keep[:] = False
+        keep[order[:top_n]] = True
+    return keep[:n_word], keep[n_word:]
+
+
+def _prune_vectorizer(vectorizer, keep, drop: bool):
+    vectorizer = copy.copy(vectorizer)
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    idf = np.asarray(vectorizer.idf_) if getattr(vectorizer, "use_idf", False) else None
+    if drop:
+        terms = [t for t, k in zip(terms, keep) if k]
+    # Plain ints pickle in a fraction of the space of the NumPy integers fit() stores.
+    # Set before idf_, whose setter checks its length against the vocabulary
+    vectorizer.vocabulary_ = {t: i for i, t in enumerate(terms)}
+    if drop and idf is not None:
+        vectorizer._tfidf = copy.copy(vectorizer._tfidf)
+        vectorizer.idf_ = idf[keep]
+        vectorizer._tfidf.n_features_in_ = len(terms)
+    # Only kept for introspection, and often larger than the vocabulary itself
+    vectorizer.__dict__.pop("stop_words_", None)
+    return vectorizer
+
+
+def prune_model(clf, vectorizer_word, vectorizer_char, keep_word, keep_char, drop_from_norm: bool = False):
+    """Copies of the three fitted objects with the n-grams outside ``keep_word``/``keep_char``
+    zeroed (or, with ``drop_from_norm``, removed from the vocabularies)."""
+    coef = np.asarray(clf.coef_)
+    keep = np.r_[keep_word, keep_char, np.ones(coef.shape[1] - len(keep_word) - len(keep_char), dtype=bool)]
+    clf = copy.copy(clf)
+    if drop_from_norm:
+        clf.coef_ = coef[:, keep]
+        clf.n_features_in_ = clf.coef_.shape[1]
+    else:
+        clf.coef_ = np.where(keep, coef, 0.0)
+    return (clf, _prune_vectorizer(vectorizer_word, keep_word, drop_from_norm),
+            _prune_vectorizer(vectorizer_char, keep_char, drop_from_norm))
+
+
+def _eval_rows(eval_csv: str = None, train_csv: str = None):
+    """Labelled texts to measure drift on and which rows they are.
+
+    Returns ``(texts, labels, rows)``: ``rows`` is ``"held_out"`` for rows of
+    ``eval_csv`` absent from ``train_csv``, ``"unverified"`` when the training
+    CSV is not available to check against, and ``"training"`` for the fallback
+    to the 80/20 test split of ``train_csv`` (which the final refit has seen).
+    """
+    import pandas as pd
+    from src.ml.feature_store import row_hashes
+
+    have_train = bool(train_csv) and os.path.exists(train_csv)
+    if eval_csv:
+        df = pd.read_csv(eval_csv)
+        texts, labels = df["text"].astype(str).to_numpy(), df["label"].astype(int).to_numpy()
+        if not have_train:
+            return texts.tolist(), labels, "unverified"
+        seen = set(row_hashes(pd.read_csv(train_csv, usecols=["text"])["text"].astype(str).tolist()).tolist())
+        unseen = np.array([h not in seen for h in row_hashes(texts.tolist()).tolist()], dtype=bool)
+        if unseen.any():
+            if not unseen.all():
+                print(f"⚠️  Leaving out {int((~unseen).sum())} rows of {eval_csv} that the model was trained on")
+            return texts[unseen].tolist(), labels[unseen], "held_out"
+        print(f"⚠️  Every row of {eval_csv} is training data")
+    if not have_train:
+        return None
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(train_csv)
+    labels = df["label"].astype(int).to_numpy()
+    _, test_idx = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42, stratify=labels)
+    print("⚠️  No rows the final model has not seen: measuring drift on its training rows (accuracy is not "
+          "a generalisation estimate; pass --eval_csv with fresh labelled articles)")
+    return df["text"].astype(str).to_numpy()[test_idx].tolist(), labels[test_idx], "training"
+
+
+def _features(texts):
+    from src.utils.preprocess import clean_text, style_features
+    from src.utils.sentiment import sentiment_features_batch
+
+    cleaned = [clean_text(t) for t in texts]
+    senti = sentiment_features_batch(cleaned)
+    small = np.array([[s.polarity, s.subjectivity, *style_features(t)] for s, t in zip(senti, texts)],
+                     dtype=np.float64)
+    return cleaned, small
+
+
+def _score(scorer: CompiledScorer, cleaned, small, batch_size: int = 64):
+    """P(fake) for every row and the mean scoring time per text."""
+    probs, seconds = [], 0.0
+    for i in range(0, len(cleaned), batch_size):
+        start = time.perf_counter()
+        probs.append(scorer.predict_proba(cleaned[i:i + batch_size], small[i:i + batch_size])[:, 1])
+        seconds += time.perf_counter() - start
+    return np.concatenate(probs) if probs else np.empty(0), seconds / max(len(cleaned), 1)
+
+
+def drift(before: CompiledScorer, after: CompiledScorer, texts, labels) -> dict:
+    """Accuracy and probability change from ``before`` to ``after`` on labelled texts."""
+    cleaned, small = _features(texts)
+    _score(after, cleaned[:8], small[:8])  # warm up
+    p_before, t_before = _score(before, cleaned, small)
+    p_after, t_after = _score(after, cleaned, small)
+    acc_before = float(((p_before > 0.5) == labels).mean())
+    acc_after = float(((p_after > 0.5) == labels).mean())
+    diff = np.abs(p_after - p_before)
+    return {
+        "texts": len(texts),
+        "accuracy_before": acc_before,
+        "accuracy_after": acc_after,
+        "accuracy_change": acc_after - acc_before,
+        "label_flips": int(((p_before > 0.5) != (p_after > 0.5)).sum()),
+        "mean_abs_prob_change": float(diff.mean()),
+        "max_abs_prob_change": float(diff.max()),
+        "ms_per_text_before": t_before * 1000,
+        "ms_per_text_after": t_after * 1000,
+    }
+
+
+def _bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def _best_of(fn, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def footprint(version) -> dict:
+    """Bytes on disk and load seconds (best of 3) of a version's pickles and compiled scorer."""
+    import joblib
+
+    paths = registry.artifact_paths(version)
+    pickles = [paths["model"], paths["vectorizer_word"], paths["vectorizer_char"]]
+    out = {
+        "pickle_bytes": sum(_bytes(p) for p in pickles),
+        "pickle_load_s": _best_of(lambda: [joblib.load(p) for p in pickles]),
+        "scorer_bytes": 0,
+        "scorer_load_s": None,
+    }
+    if os.path.isdir(paths["scorer"]):
+        out["scorer_bytes"] = _bytes(paths["scorer"])
+        # Read every array: a memory-mapped load defers the I/O to the first requests
+        out["scorer_load_s"] = _best_of(lambda: CompiledScorer.load(paths["scorer"], mmap=False))
+    return out
+
+
+def compress_version(version: str = None, min_coef: float = None, top_n: int = None, dtype: str = "int8",
+                     drop_from_norm: bool = False, eval_csv: str = None, activate: bool = False):
+    """Prune and quantize ``version`` (default: the active one) into a new version.
+
+    Returns ``(new_version, report)``; the report is also stored under the
+    ``compression`` key of the new version's metrics.
+    """
+    import joblib
+
+    if dtype not in QUANTIZED_DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype!r}; expected one of {', '.join(QUANTIZED_DTYPES)}")
+    version = version or registry.active_version()
+    source = registry.manifest(version) if version else {}
+    paths = registry.artifact_paths(version)
+    clf, vectorizer_word, vectorizer_char = (joblib.load(paths["model"]), joblib.load(paths["vectorizer_word"]),
+                                             joblib.load(paths["vectorizer_char"]))
+    for vectorizer in (vectorizer_word, vectorizer_char):
+        if not hasattr(vectorizer, "vocabulary_"):
+            raise ValueError(f"{type(vectorizer).__name__} has no vocabulary to prune (hashed features?)")
+    n_word, n_char = len(vectorizer_word.vocabulary_), len(vectorizer_char.vocabulary_)
+    keep_word, keep_char = select_columns(clf.coef_, n_word, n_char, min_coef, top_n)
+    pruned = prune_model(clf, vectorizer_word, vectorizer_char, keep_word, keep_char, drop_from_norm)
+    n_before, n_after = n_word + n_char, int(keep_word.sum() + keep_char.sum())
+    print(f"✂️  Keeping {n_after} of {n_before} n-grams, weights as {dtype}")
+
+    report = {"source_version": version, "min_coef": min_coef, "top_n": top_n, "dtype": dtype,
+              "drop_from_norm": drop_from_norm, "ngrams_before": n_before, "ngrams_after": n_after}
+    train_csv = source.get("dataset", {}).get("path")
+    rows = _eval_rows(eval_csv, train_csv)
+    if rows is not None:
+        texts, labels, kind = rows
+        after = CompiledScorer.from_sklearn(*pruned).quantized(dtype)
+        report["drift"] = {"rows": kind, "csv": eval_csv if kind != "training" else train_csv,
+                           **drift(CompiledScorer.from_sklearn(clf, vectorizer_word, vectorizer_char), after,
+                                   texts, labels)}
+    else:
+        print(f"⚠️  Training CSV {train_csv!r} not found and no --eval_csv; skipping the drift comparison")
+
+    from src.ml.pipeline import save_artifacts
+
+    # Measured first: saving prunes old versions, possibly the source
+    before = footprint(version)
+    metrics = {**source.get("metrics", {}), "compression": dict(report)}
+    new_version = save_artifacts(*pruned, metrics=metrics, dataset=source.get("dataset"), activate=activate,
+                                 scorer_dtype=dtype)
+    report["footprint"] = {"before": before, "after": footprint(new_version)}
+    return new_version, report
+
+
+def print_report(report: dict):
+    fp = report["footprint"]
+    before, after = fp["before"], fp["after"]
+
+    def change(key, unit, scale=1.0):
+        b, a = before[key], after[key]
+        if b is None or a is None:
+            return "n/a"
+        return f"{b * scale:.2f} -> {a * scale:.2f} {unit}" + (f" ({(a - b) / b * 100:+.0f}%)" if b else "")
+
+    print(f"  n-grams        : {report['ngrams_before']} -> {report['ngrams_after']}")
+    print(f"  pickles        : {change('pickle_bytes', 'MB', 1e-6)}, load {change('pickle_load_s', 'ms', 1e3)}")
+    print(f"  compiled scorer: {change('scorer_bytes', 'MB', 1e-6)}, load {change('scorer_load_s', 'ms', 1e3)}")
+    d = report.get("drift")
+    if d:
+        label = {"held_out": "held-out", "training": "TRAINING rows", "unverified": "eval rows"}[d["rows"]]
+        print(f"  {label} ({d['texts']} texts): accuracy {d['accuracy_before']:.4f} -> "
+              f"{d['accuracy_after']:.4f}, {d['label_flips']} label flips, "
+              f"|Δp| mean {d['mean_abs_prob_change']:.4f} max {d['max_abs_prob_change']:.4f}")
+        print(f"  latency        : {d['ms_per_text_before']:.3f} -> {d['ms_per_text_after']:.3f} ms/text")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Prune and quantize a model version into a new version")
+    parser.add_argument("--version", help="Version to compress (default: the active one)")
+    parser.add_argument("--min_coef", type=float, help="Drop n-grams whose |coefficient| is below this")
+    parser.add_argument("--top_n", type=int, help="Keep only the N n-grams with the largest |coefficient|")
+    parser.add_argument("--dtype", choices=QUANTIZED_DTYPES, default="int8",
+                        help="Storage type of the compiled scorer's idf and weights")
+    parser.add_argument("--drop_from_norm", action="store_true",
+                        help="Remove pruned n-grams from the vocabularies too (smaller, but renormalises scores)")
+    parser.add_argument("--eval_csv", help="Labelled CSV of articles the model was not trained on to measure "
+                                           "drift on (default: training rows, reported as such)")
+    parser.add_argument("--activate", action="store_true", help="Serve the compressed version")
+    parser.add_argument("--report", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    new_version, report = compress_version(args.version, min_coef=args.min_coef, top_n=args.top_n, dtype=args.dtype,
+                                           drop_from_norm=args.drop_from_norm, eval_csv=args.eval_csv,
+                                           activate=args.activate)
+    print(f"✅ Compressed {report['source_version'] or 'flat artifacts'} into {new_version}")
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
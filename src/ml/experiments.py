@@ -0,0 +1,163 @@
+"""
+Experiment runner for ``train_model``.
+
+The train/test split and every CV fold matrix are materialised once, dumped
+to a temporary folder and reloaded memory-mapped, so all candidate models and
+all worker processes read the same pages instead of re-slicing (or copying)
+the feature matrices per fit. Every (experiment, candidate, fold) fit runs as
+one task in a joblib process pool.
+
+Experiments (select with ``--experiments``):
+
+* ``baseline_svc``  calibrated LinearSVC on TF-IDF features only
+* ``baseline_lr``   CV-tuned LogisticRegression on TF-IDF features only
+* ``full``          CV-tuned LogisticRegression on TF-IDF + sentiment/style
+
+The final model is always a LogisticRegression refit on all rows with the C
+chosen by ``full`` (C=1.0 when ``full`` is not run).
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+EXPERIMENTS = ("baseline_svc", "baseline_lr", "full")
+LR_GRID = (0.5, 1, 2)
+TRAIN_JOBS = int(os.environ.get("TRAIN_JOBS", "-1"))
+
+
+def _logreg(C=1.0):
+    from sklearn.linear_model import LogisticRegression
+
+    return LogisticRegression(max_iter=1000, class_weight='balanced', solver='liblinear', C=C)
+
+
+def _share(obj, folder: str, name: str):
+    """Dump ``obj`` to ``folder`` and reload it memory-mapped (read-only)."""
+    import joblib
+
+    path = os.path.join(folder, name + ".joblib")
+    joblib.dump(obj, path)
+    return joblib.load(path, mmap_mode="r")
+
+
+def _fit(estimator, X, y):
+    return estimator.fit(X, y)
+
+
+def _fit_f1(estimator, X_train, y_train, X_val, y_val):
+    from sklearn.metrics import f1_score
+
+    estimator.fit(X_train, y_train)
+    return f1_score(y_val, estimator.predict(X_val))
+
+
+def _report(name: str, clf, X_test, y_test):
+    from sklearn.metrics import accuracy_score, classification_report
+
+    y_pred = clf.predict(X_test)
+    print(f"{name} Accuracy:", accuracy_score(y_test, y_pred))
+    print(f"{name} Report:\n", classification_report(y_test, y_pred))
+    return float(accuracy_score(y_test, y_pred))
+
+
+def run_experiments(X_text, small, labels, experiments=EXPERIMENTS, n_jobs: int = TRAIN_JOBS):
+    """Run the selected experiments and fit the final model.
+
+    ``X_text`` is the sparse TF-IDF matrix, ``small`` the (n, 5)
+    sentiment/style matrix. Returns (final_clf, metrics) where
+    ``metrics`` maps experiment name to test accuracy (and the chosen C).
+    """
+    from joblib import Parallel, delayed
+    from scipy.sparse import csr_matrix, hstack
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+    from sklearn.svm import LinearSVC
+
+    unknown = set(experiments) - set(EXPERIMENTS)
+    if unknown:
+        raise ValueError(f"Unknown experiments: {sorted(unknown)} (choose from {EXPERIMENTS})")
+
+    labels = np.asarray(labels)
+    n_samples = len(labels)
+    # liblinear trains on float64 CSR; convert once rather than in every fit
+    X_text = csr_matrix(X_text, dtype=np.float64)
+    X_full = hstack([X_text, csr_matrix(small, dtype=np.float64)], format="csr")
+
+    train_idx, test_idx = train_test_split(
+        np.arange(n_samples), test_size=0.2, random_state=42, stratify=labels
+    )
+    y_train, y_test = labels[train_idx], labels[test_idx]
+    print(f"Data Split: 80% Training ({len(y_train)} samples), 20% Testing ({len(y_test)} samples)")
+
+    y_min = min(np.bincount(y_train)[np.unique(y_train)])
+    tune = y_min >= 2 and n_samples <= 20000
+    cv = min(3, max(2, y_min))
+    folds = list(StratifiedKFold(n_splits=cv, shuffle=True, random_state=42).split(train_idx, y_train)) if tune else []
+
+    folder = tempfile.mkdtemp(prefix="truthguard_train_", dir=os.environ.get("JOBLIB_TEMP_FOLDER"))
+    try:
+        feature_sets = {}
+        for name, X in (("text", X_text), ("full", X_full)):
+            if name == "full" or {"baseline_svc", "baseline_lr"} & set(experiments):
+                X_train = X[train_idx]
+                fold_mats = [(X_train[tr], y_train[tr], X_train[va], y_train[va]) for tr, va in folds]
+                feature_sets[name] = _share((X_train, fold_mats), folder, name)
+
+        # Phase 1: every CV fit, plus fits that need no tuning
+        tasks, keys = [], []
+        for exp, fs in (("baseline_lr", "text"), ("full", "full")):
+            if exp in experiments and tune:
+                for C in LR_GRID:
+                    for k, fold in enumerate(feature_sets[fs][1]):
+                        tasks.append(delayed(_fit_f1)(_logreg(C), *fold))
+                        keys.append((exp, C, k))
+        if "baseline_svc" in experiments:
+            X_train = feature_sets["text"][0]
+            if y_min < 2:
+                svc = LogisticRegression(max_iter=400, class_weight='balanced')
+            else:
+                svc = CalibratedClassifierCV(LinearSVC(class_weight='balanced'), method='sigmoid',
+                                             cv=2 if y_min < 3 else 3)
+            tasks.append(delayed(_fit)(svc, X_train, y_train))
+            keys.append("baseline_svc")
+
+        with Parallel(n_jobs=n_jobs, max_nbytes=None) as parallel:
+            results = dict(zip(keys, parallel(tasks)))
+
+            best_C = {}
+            for exp in ("baseline_lr", "full"):
+                if exp in experiments:
+                    best_C[exp] = 1.0
+                    if tune:
+                        means = [np.mean([results[(exp, C, k)] for k in range(cv)]) for C in LR_GRID]
+                        best = int(np.argmax(means))
+                        best_C[exp] = LR_GRID[best]
+                        print(f"{exp} best params: {{'C': {LR_GRID[best]}, 'solver': 'liblinear'}}")
+                        print(f"{exp} CV best f1:", means[best])
+
+            # Phase 2: best candidates on the training split, and the final model on all rows
+            tasks, keys = [], []
+            for exp, fs in (("baseline_lr", "text"), ("full", "full")):
+                if exp in experiments:
+                    tasks.append(delayed(_fit)(_logreg(best_C[exp]), feature_sets[fs][0], y_train))
+                    keys.append(exp)
+            tasks.append(delayed(_fit)(_logreg(best_C.get("full", 1.0)), _share(X_full, folder, "all"), labels))
+            keys.append("final")
+            results.update(zip(keys, parallel(tasks)))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    metrics = {}
+    titles = {"baseline_svc": "Baseline (calibrated LinearSVC, no sentiment/style)",
+              "baseline_lr": "Baseline (no sentiment/style)",
+              "full": "With sentiment+style"}
+    for exp in EXPERIMENTS:
+        if exp in experiments:
+            X_test = (X_full if exp == "full" else X_text)[test_idx]
+            metrics[exp] = {"accuracy": _report(titles[exp], results[exp], X_test, y_test)}
+            if exp in best_C:
+                metrics[exp]["C"] = best_C[exp]
+    return results["final"], metrics
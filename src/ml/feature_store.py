@@ -0,0 +1,164 @@
+"""
+On-disk feature store for ``train_model``.
+
+Layout under FEATURE_STORE_DIR (default ``src/ml/feature_cache``)::
+
+    <featurizer key>/rows.npz                 cleaned text + sentiment/style per row
+    <featurizer key>/<vectorizer key>/        fitted TF-IDF outputs for one dataset
+        X_word.npz, X_char.npz                compressed sparse matrices
+        vectorizers.pkl                       the fitted (word, char) vectorizers
+
+The featurizer key hashes FEATURIZER_VERSION and the sentiment engine; rows
+are matched by a hash of their text, so rows appended to the CSV (or any
+other new row) are the only ones featurized on the next run. TF-IDF
+vocabulary and idf depend on every row, so vectorizer outputs are keyed by
+the dataset hash plus the vectorizer parameters and refit when either changes.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import joblib
+import numpy as np
+
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", os.path.join("src", "ml", "feature_cache"))
+# Bump when clean_text, style_features or the small-feature layout change
+FEATURIZER_VERSION = 1
+# zlib-compress the sparse matrices (~40% smaller, but ~100x slower to write)
+FEATURE_STORE_COMPRESS = os.environ.get("FEATURE_STORE_COMPRESS", "1") == "1"
+
+
+def _digest(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def featurizer_key() -> str:
+    from src.utils.sentiment import SENTIMENT_ENGINE
+
+    return _digest({"version": FEATURIZER_VERSION, "sentiment": SENTIMENT_ENGINE})
+
+
+def row_hashes(texts) -> np.ndarray:
+    return np.array([hashlib.blake2b(t.encode("utf-8"), digest_size=16).digest() for t in texts], dtype="S16")
+
+
+def dataset_hash(hashes: np.ndarray) -> str:
+    return hashlib.sha256(hashes.tobytes()).hexdigest()[:16]
+
+
+def _pack_strings(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(buf, offsets):
+    raw = buf.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def _save_npz(path, **arrays):
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+class FeatureStore:
+    def __init__(self, root: str = FEATURE_STORE_DIR):
+        self.dir = os.path.join(root, featurizer_key())
+        self.rows_path = os.path.join(self.dir, "rows.npz")
+
+    def _load_rows(self):
+        if not os.path.exists(self.rows_path):
+            return None
+        try:
+            with np.load(self.rows_path) as z:
+                return z["hashes"], _unpack_strings(z["cleaned"], z["offsets"]), z["small"]
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable feature cache {self.rows_path}: {e}")
+            return None
+
+    def featurize(self, texts, hashes, n_jobs: int = 1):
+        """Cleaned text and the (n, 5) sentiment/style matrix for ``texts``.
+
+        Rows already in the store are reused; only unseen rows are featurized.
+        When anything was featurized the store is rewritten to hold exactly
+        this dataset's rows.
+        """
+        from src.ml.pipeline import _small_feature_matrix, build_features
+
+        cleaned = [None] * len(texts)
+        small = np.zeros((len(texts), 5), dtype=np.float64)
+        todo = list(range(len(texts)))
+
+        stored = self._load_rows()
+        if stored is not None:
+            old_hashes, old_cleaned, old_small = stored
+            position = {h: i for i, h in enumerate(old_hashes.tolist())}
+            todo = []
+            for i, h in enumerate(hashes.tolist()):
+                j = position.get(h)
+                if j is None:
+                    todo.append(i)
+                else:
+                    cleaned[i] = old_cleaned[j]
+                    small[i] = old_small[j]
+
+        print(f"Feature cache: {len(texts) - len(todo)} rows cached, featurizing {len(todo)}")
+        if not todo:
+            return cleaned, small
+
+        new_cleaned, senti, style = build_features([texts[i] for i in todo], n_jobs=n_jobs)
+        new_small = _small_feature_matrix(senti, style)
+        for k, i in enumerate(todo):
+            cleaned[i] = new_cleaned[k]
+        small[todo] = new_small
+
+        os.makedirs(self.dir, exist_ok=True)
+        buf, offsets = _pack_strings(cleaned)
+        _save_npz(self.rows_path, hashes=hashes, cleaned=buf, offsets=offsets, small=small)
+        return cleaned, small
+
+    def vectorize(self, cleaned, data_hash: str, vectorizer_word, vectorizer_char):
+        """Fit both vectorizers on ``cleaned``, or load the outputs of an identical earlier fit.
+
+        Returns (X_word, X_char, vectorizer_word, vectorizer_char).
+        """
+        from scipy.sparse import load_npz, save_npz
+
+        key = _digest({"data": data_hash, "word": vectorizer_word.get_params(),
+                       "char": vectorizer_char.get_params()})
+        path = os.path.join(self.dir, key)
+        if os.path.isdir(path):
+            try:
+                vw, vc = joblib.load(os.path.join(path, "vectorizers.pkl"))
+                X_word = load_npz(os.path.join(path, "X_word.npz"))
+                X_char = load_npz(os.path.join(path, "X_char.npz"))
+                print(f"Feature cache: reusing fitted vectorizers from {path}")
+                return X_word, X_char, vw, vc
+            except Exception as e:
+                print(f"⚠️  Ignoring unreadable feature cache {path}: {e}")
+
+        X_word = vectorizer_word.fit_transform(cleaned)
+        X_char = vectorizer_char.fit_transform(cleaned)
+        # stop_words_ only lists the pruned terms (introspection only) and is
+        # most of the pickle size
+        for vectorizer in (vectorizer_word, vectorizer_char):
+            if hasattr(vectorizer, "stop_words_"):
+                del vectorizer.stop_words_
+
+        # Outputs for other datasets or parameters are stale now; keep only this one
+        os.makedirs(self.dir, exist_ok=True)
+        for name in os.listdir(self.dir):
+            if os.path.isdir(os.path.join(self.dir, name)):
+                shutil.rmtree(os.path.join(self.dir, name), ignore_errors=True)
+        tmp = path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        save_npz(os.path.join(tmp, "X_word.npz"), X_word.tocsr(), compressed=FEATURE_STORE_COMPRESS)
+        save_npz(os.path.join(tmp, "X_char.npz"), X_char.tocsr(), compressed=FEATURE_STORE_COMPRESS)
+        joblib.dump((vectorizer_word, vectorizer_char), os.path.join(tmp, "vectorizers.pkl"))
+        os.replace(tmp, path)
+        return X_word, X_char, vectorizer_word, vectorizer_char
@@ -1,43 +1,126 @@
+import hashlib
 import os
-import joblib
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
-from sklearn.svm import LinearSVC
-from sklearn.calibration import CalibratedClassifierCV
-import string
-from collections import Counter
-
-from src.utils.preprocess import clean_text
-from src.utils.sentiment import sentiment_features
-from scipy.sparse import hstack, csr_matrix
-from sklearn.model_selection import GridSearchCV, StratifiedKFold
+import threading
+import time
+import weakref
+from dataclasses import dataclass, replace
+from typing import Optional
 import numpy as np
 
-MODEL_DIR = os.path.join("src", "ml", "artifacts")
+from src.utils.preprocess import clean_text, style_features
+from src.utils.sentiment import SentimentResult, sentiment_features_batch
+from src.utils.cache import SQLiteCache, make_cache
+from src.utils.metrics import MODEL_LOAD_SECONDS, register_cache, time_stage
+from src.ml.experiments import EXPERIMENTS, TRAIN_JOBS
+from src.ml.scorer import CompiledScorer
+from src.ml import registry
+
+MODEL_DIR = registry.MODEL_DIR
+# Flat (unversioned) artifacts, e.g. downloaded from the model hub; served
+# until a training run activates a version in the registry
 MODEL_PATH = os.path.join(MODEL_DIR, "fake_news_model.pkl")
 VECTORIZER_PATH = os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl")
 # New: separate word and char vectorizers
 VECTORIZER_WORD_PATH = os.path.join(MODEL_DIR, "tfidf_word_vectorizer.pkl")
 VECTORIZER_CHAR_PATH = os.path.join(MODEL_DIR, "tfidf_char_vectorizer.pkl")
+# Compiled NumPy scorer exported from the three pickles above (directory of
+# memory-mapped .npy arrays shared by all workers on a host)
+SCORER_PATH = os.path.join(MODEL_DIR, "compiled_scorer")
+USE_COMPILED_SCORER = os.environ.get("USE_COMPILED_SCORER", "1") == "1"
+# How often (seconds) the background watcher checks the registry's ACTIVE pointer
+MODEL_RELOAD_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", "5"))
+
+# Long documents: at most MAX_DOC_CHARS characters of any text are scored, so
+# the cost of one prediction has an upper bound. LONG_DOC_STRATEGY picks which:
+#   truncate   the first MAX_DOC_CHARS
+#   head_tail  the first and last MAX_DOC_CHARS / 2
+#   windows    MAX_DOC_CHARS / DOC_WINDOW_CHARS evenly spaced windows, scored
+#              as separate rows of the batch and averaged; a smaller budget
+#              shrinks the windows rather than dropping them
+#   full       everything (no bound)
+LONG_DOC_STRATEGIES = ("truncate", "head_tail", "windows", "full")
+LONG_DOC_STRATEGY = os.environ.get("LONG_DOC_STRATEGY", "head_tail")
+MAX_DOC_CHARS = int(os.environ.get("MAX_DOC_CHARS", "20000"))
+DOC_WINDOW_CHARS = int(os.environ.get("DOC_WINDOW_CHARS", "4000"))
+
+# Explanations (predict(..., explain=True)): the dense features appended after
+# the word and char TF-IDF columns, and how many n-grams to list per block
+SMALL_FEATURE_NAMES = ("polarity", "subjectivity", "exclamation_ratio", "uppercase_ratio", "punctuation_ratio")
+EXPLAIN_TOP_K = int(os.environ.get("EXPLAIN_TOP_K", "10"))
+
+# Prediction results keyed by a hash of the text plus the served model, so a
+# new model never sees an old result. In process memory by default; with
+# PREDICT_CACHE_BACKEND=sqlite every worker on the host shares a sqlite file
+# (PREDICT_CACHE_PATH) behind a PREDICT_CACHE_LOCAL_ENTRIES in-process LRU.
+# Set PREDICT_CACHE_MAX_ENTRIES=0 to disable.
+_prediction_cache = make_cache("PREDICT", default_ttl=7 * 24 * 3600, default_max_entries=10000,
+                               default_local_entries=2048)
+register_cache("prediction", _prediction_cache)
+
 
+# Rows per work unit handed to each feature-extraction process
+FEATURE_CHUNK_SIZE = 500
 
-def build_features(texts):
+
+def _featurize_chunk(texts):
     cleaned = [clean_text(t) for t in texts]
-    senti = [sentiment_features(t) for t in cleaned]
-    return cleaned, senti
+    senti = sentiment_features_batch(cleaned)
+    style = [style_features(t) for t in texts]
+    return cleaned, senti, style
+
+
+def build_features(texts, n_jobs: int = 1, chunk_size: int = FEATURE_CHUNK_SIZE):
+    """Clean texts and compute sentiment (on cleaned text) and style (on raw text).
+
+    With ``n_jobs`` > 1 (or -1 for all cores) the texts are split into
+    ``chunk_size`` work units and featurized in a process pool. Chunks are
+    reassembled in input order, so the output is identical to the serial path.
+    Returns (cleaned, senti, style).
+    """
+    texts = list(texts)
+    if n_jobs is not None and n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    if not n_jobs or n_jobs == 1 or len(texts) <= chunk_size:
+        return _featurize_chunk(texts)
 
+    from concurrent.futures import ProcessPoolExecutor
+
+    work = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    cleaned, senti, style = [], [], []
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(work))) as pool:
+        for c, s, st in pool.map(_featurize_chunk, work):
+            cleaned.extend(c)
+            senti.extend(s)
+            style.extend(st)
+    return cleaned, senti, style
+
+
+def train_model(dataset_csv: str = os.path.join("src", "data", "kaggle_fake_real_combined.csv"), n_jobs: int = 1,
+                feature_cache: bool = True, experiments=EXPERIMENTS, train_jobs: int = TRAIN_JOBS, progress=None):
+    """Train and save the TF-IDF + logistic regression model.
+
+    With ``feature_cache`` the cleaned text, sentiment/style features and
+    fitted vectorizer outputs are reused from the on-disk feature store
+    (``src/ml/feature_store.py``), so a re-train on an unchanged CSV goes
+    straight to model fitting and appended rows are the only ones featurized.
+
+    Model selection runs in ``src/ml/experiments.py`` on ``train_jobs``
+    processes; ``experiments`` picks which comparison models to evaluate.
+    Returns the per-experiment test metrics. ``progress``, if given, is
+    called with the name of each stage as it starts.
+    """
+    progress = progress or (lambda stage: None)
+    # Training-only dependencies are imported here so serving never loads them
+    import pandas as pd
+    from scipy.sparse import hstack
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from src.ml.experiments import run_experiments
 
-def train_model(dataset_csv: str = os.path.join("src", "data", "kaggle_fake_real_combined.csv")):
     os.makedirs(MODEL_DIR, exist_ok=True)
+    progress("loading dataset")
     df = pd.read_csv(dataset_csv)
     texts = df["text"].astype(str).tolist()
     labels = df["label"].astype(int).tolist()
-    n_samples = len(labels)
-
-    cleaned, senti = build_features(texts)
 
     # Word-level TF-IDF (memory-aware)
     vectorizer_word = TfidfVectorizer(
@@ -56,131 +139,226 @@ def train_model(dataset_csv: str = os.path.join("src", "data", "kaggle_fake_real
         max_features=50000,
         dtype=np.float32,
     )
-    X_word = vectorizer_word.fit_transform(cleaned)
-    X_char = vectorizer_char.fit_transform(cleaned)
-    X_text = hstack([X_word, X_char])
+    from src.ml.feature_store import FeatureStore, dataset_hash, row_hashes
 
-    # Baseline model (no sentiment/style features): Linear SVM + calibrated probabilities
-    Xb_train, Xb_test, yb_train, yb_test = train_test_split(
-        X_text, labels, test_size=0.2, random_state=42, stratify=labels
-    )
-    print(f"Data Split: 80% Training ({len(yb_train)} samples), 20% Testing ({len(yb_test)} samples)")
-    yb_counts = Counter(yb_train)
-    yb_min = min(yb_counts.values())
-    if yb_min < 2:
-        baseline_clf = LogisticRegression(max_iter=400, class_weight='balanced')
-    else:
-        cv_b = 2 if yb_min < 3 else 3
-        baseline_svc = LinearSVC(class_weight='balanced')
-        baseline_clf = CalibratedClassifierCV(baseline_svc, method='sigmoid', cv=cv_b)
-    baseline_clf.fit(Xb_train, yb_train)
-    yb_pred = baseline_clf.predict(Xb_test)
-    print("Baseline (no sentiment/style) Accuracy:", accuracy_score(yb_test, yb_pred))
-    print("Baseline (no sentiment/style) Report:\n", classification_report(yb_test, yb_pred))
-
-    # Baseline model (no sentiment/style features) with CV-tuned Logistic Regression (memory-aware)
-    Xb_train, Xb_test, yb_train, yb_test = train_test_split(
-        X_text, labels, test_size=0.2, random_state=42, stratify=labels
-    )
-    yb_counts = Counter(yb_train)
-    yb_min = min(yb_counts.values())
-    cv_b = min(3, max(2, yb_min))
-    if yb_min < 2 or n_samples > 20000:
-        baseline_clf = LogisticRegression(max_iter=1000, class_weight='balanced', solver='liblinear', C=1.0)
-    else:
-        skf_b = StratifiedKFold(n_splits=cv_b, shuffle=True, random_state=42)
-        lr_b = LogisticRegression(max_iter=1000, class_weight='balanced')
-        grid_b = GridSearchCV(
-            lr_b,
-            param_grid={"C": [0.5, 1, 2], "solver": ["liblinear"]},
-            cv=skf_b,
-            n_jobs=1,
-            scoring="f1",
+    progress("featurizing")
+    hashes = row_hashes(texts)
+    if feature_cache:
+        store = FeatureStore()
+        cleaned, small = store.featurize(texts, hashes, n_jobs=n_jobs)
+        X_word, X_char, vectorizer_word, vectorizer_char = store.vectorize(
+            cleaned, dataset_hash(hashes), vectorizer_word, vectorizer_char
         )
-        grid_b.fit(Xb_train, yb_train)
-        baseline_clf = grid_b.best_estimator_
-        print("Baseline best params:", grid_b.best_params_)
-        print("Baseline CV best f1:", grid_b.best_score_)
-    baseline_clf.fit(Xb_train, yb_train)
-    yb_pred = baseline_clf.predict(Xb_test)
-    print("Baseline (no sentiment/style) Accuracy:", accuracy_score(yb_test, yb_pred))
-    print("Baseline (no sentiment/style) Report:\n", classification_report(yb_test, yb_pred))
-
-    # Combine sentiment features + simple style features
-    def style_feats(t: str):
-        if not t:
-            return (0.0, 0.0, 0.0)
-        total = max(len(t), 1)
-        exclam = t.count('!') / total
-        letters = sum(1 for c in t if c.isalpha())
-        upper = (sum(1 for c in t if c.isupper()) / max(letters, 1)) if letters else 0.0
-        punct = (sum(1 for c in t if c in string.punctuation) / total)
-        return (exclam, upper, punct)
-
-    style = [style_feats(t) for t in texts]
-    senti_mat = np.array([[s.polarity, s.subjectivity] for s in senti])
-    style_mat = np.array(style)
-    small_feats = csr_matrix(np.hstack([senti_mat, style_mat]))
-    X = hstack([X_text, small_feats])
-
-    X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=0.2, random_state=42, stratify=labels)
-
-    y_counts = Counter(y_train)
-    y_min = min(y_counts.values())
-    cv = min(3, max(2, y_min))
-    if y_min < 2 or n_samples > 20000:
-        clf = LogisticRegression(max_iter=1000, class_weight='balanced', solver='liblinear', C=1.0)
     else:
-        skf = StratifiedKFold(n_splits=cv, shuffle=True, random_state=42)
-        lr = LogisticRegression(max_iter=1000, class_weight='balanced')
-        grid = GridSearchCV(
-            lr,
-            param_grid={"C": [0.5, 1, 2], "solver": ["liblinear"]},
-            cv=skf,
-            n_jobs=1,
-            scoring="f1",
-        )
-        grid.fit(X_train, y_train)
-        clf = grid.best_estimator_
-        print("With sentiment+style best params:", grid.best_params_)
-        print("With sentiment+style CV best f1:", grid.best_score_)
-    
-    clf.fit(X_train, y_train)
-
-    y_pred = clf.predict(X_test)
-    print("With sentiment+style Accuracy:", accuracy_score(y_test, y_pred))
-    print("With sentiment+style Report:\n", classification_report(y_test, y_pred))
-
-    # Retrain final model on full data using best estimator (or current clf params)
-    if y_min < 2:
-        final_lr = LogisticRegression(max_iter=1000, class_weight='balanced', solver='liblinear', C=1.0)
-    else:
-        # reuse best params if available
-        final_lr = LogisticRegression(
-            max_iter=1000,
-            class_weight='balanced',
-            solver=getattr(clf, 'solver', 'liblinear'),
-            C=getattr(clf, 'C', 1.0),
+        cleaned, senti, style = build_features(texts, n_jobs=n_jobs)
+        small = _small_feature_matrix(senti, style)
+        X_word = vectorizer_word.fit_transform(cleaned)
+        X_char = vectorizer_char.fit_transform(cleaned)
+    X_text = hstack([X_word, X_char], format="csr")
+
+    progress("fitting models")
+    final_lr, metrics = run_experiments(X_text, small, labels, experiments=experiments, n_jobs=train_jobs)
+
+    progress("saving artifacts")
+    save_artifacts(final_lr, vectorizer_word, vectorizer_char, metrics=metrics,
+                   dataset={"path": dataset_csv, "rows": len(texts), "hash": dataset_hash(hashes)})
+    return metrics
+
+
+def _small_feature_matrix(senti, style):
+    return np.hstack([np.array([[s.polarity, s.subjectivity] for s in senti]).reshape(-1, 2),
+                      np.array(style).reshape(-1, 3)])
+
+
+def train_model_streaming(
+    dataset_csv: str = os.path.join("src", "data", "kaggle_fake_real_combined.csv"),
+    chunksize: int = 5000,
+    epochs: int = 1,
+    holdout_every: int = 5,
+    n_jobs: int = 1,
+):
+    """Out-of-core training for datasets larger than RAM.
+
+    Reads the CSV ``chunksize`` rows at a time, featurizes each chunk with
+    stateless hashed word/char n-grams (sublinear tf, l2-normalised, no idf)
+    and updates an ``SGDClassifier(loss="log_loss")`` with ``partial_fit``, so
+    only one chunk is ever in memory. Every ``holdout_every``-th row is held
+    out and scored in a final streaming pass; only a confusion matrix is kept.
+
+    The saved artifacts are the same three pickles ``load_model`` serves: the
+    hashing pipelines expose ``transform`` and the classifier ``predict_proba``.
+    """
+    import pandas as pd
+    from scipy.sparse import csr_matrix, hstack
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+
+    def hashed(**kwargs):
+        return make_pipeline(
+            HashingVectorizer(alternate_sign=False, norm=None, dtype=np.float32, **kwargs),
+            TfidfTransformer(use_idf=False, sublinear_tf=True),
         )
-    final_lr.fit(X, labels)
 
-    joblib.dump(final_lr, MODEL_PATH)
-    joblib.dump(vectorizer_word, VECTORIZER_WORD_PATH)
-    joblib.dump(vectorizer_char, VECTORIZER_CHAR_PATH)
+    vectorizer_word = hashed(ngram_range=(1, 2), n_features=2 ** 20)
+    vectorizer_char = hashed(analyzer='char', ngram_range=(3, 4), n_features=2 ** 18)
+    clf = SGDClassifier(loss="log_loss", alpha=1e-6, random_state=42)
+    classes = np.array([0, 1])
 
+    def chunks():
+        offset = 0
+        for df in pd.read_csv(dataset_csv, chunksize=chunksize, usecols=["text", "label"]):
+            texts = df["text"].astype(str).tolist()
+            labels = df["label"].astype(int).to_numpy()
+            holdout = (np.arange(offset, offset + len(df)) % holdout_every) == 0
+            offset += len(df)
+            yield texts, labels, holdout
 
-_model_cache = None
+    def featurize(texts):
+        cleaned, senti, style = build_features(texts, n_jobs=n_jobs)
+        return hstack([
+            vectorizer_word.transform(cleaned),
+            vectorizer_char.transform(cleaned),
+            csr_matrix(_small_feature_matrix(senti, style)),
+        ], format="csr")
 
-def load_model():
-    """Load model with caching and automatic download if missing."""
-    global _model_cache
-    
-    # Return cached model if available
-    if _model_cache is not None:
-        return _model_cache
-    
-    # Check if models exist, download if not
-    if not os.path.exists(MODEL_PATH):
+    n_train = 0
+    for epoch in range(epochs):
+        n_train = 0
+        for texts, labels, holdout in chunks():
+            train = ~holdout
+            if not train.any():
+                continue
+            X = featurize([t for t, keep in zip(texts, train) if keep])
+            clf.partial_fit(X, labels[train], classes=classes)
+            n_train += int(train.sum())
+            print(f"Epoch {epoch + 1}/{epochs}: trained on {n_train} rows", end="\r")
+        print()
+
+    confusion = np.zeros((2, 2), dtype=np.int64)
+    for texts, labels, holdout in chunks():
+        if not holdout.any():
+            continue
+        X = featurize([t for t, keep in zip(texts, holdout) if keep])
+        np.add.at(confusion, (labels[holdout], clf.predict(X)), 1)
+    n_test = int(confusion.sum())
+    print(f"Data Split: {n_train} training rows, {n_test} held-out rows (every {holdout_every}th row)")
+    metrics = {}
+    if n_test:
+        tn, fp, fn, tp = confusion.ravel()
+        precision = tp / max(tp + fp, 1)
+        recall = tp / max(tp + fn, 1)
+        f1 = 2 * precision * recall / max(precision + recall, 1e-12)
+        print("Streaming model Accuracy:", (tn + tp) / n_test)
+        print(f"Streaming model Precision: {precision:.4f}  Recall: {recall:.4f}  F1: {f1:.4f}")
+        metrics["streaming"] = {"accuracy": float((tn + tp) / n_test), "precision": float(precision),
+                                "recall": float(recall), "f1": float(f1)}
+
+    save_artifacts(clf, vectorizer_word, vectorizer_char, metrics=metrics,
+                   dataset={"path": dataset_csv, "rows": n_train + n_test})
+    return metrics
+
+
+def feature_config(vectorizer_word, vectorizer_char) -> dict:
+    """Everything that must match between training and serving for a model to be valid."""
+    from src.ml.feature_store import FEATURIZER_VERSION
+    from src.utils.sentiment import SENTIMENT_ENGINE
+
+    return {
+        "featurizer_version": FEATURIZER_VERSION,
+        "sentiment_engine": SENTIMENT_ENGINE,
+        "small_features": ["polarity", "subjectivity", "exclamation_ratio", "uppercase_ratio", "punctuation_ratio"],
+        "vectorizer_word": {k: str(v) for k, v in vectorizer_word.get_params().items()},
+        "vectorizer_char": {k: str(v) for k, v in vectorizer_char.get_params().items()},
+    }
+
+
+def save_artifacts(clf, vectorizer_word, vectorizer_char, metrics=None, dataset=None, activate: bool = True,
+                   scorer_dtype: str = None):
+    """Write the model as a new registry version and (by default) make it the active one.
+
+    Serving processes swap it in within MODEL_RELOAD_INTERVAL seconds.
+    ``scorer_dtype`` quantizes the compiled scorer (see ``CompiledScorer.quantized``).
+    Returns the version name.
+    """
+    staging = registry.staging_dir()
+    paths = {
+        "model": os.path.join(staging, registry.MODEL_FILE),
+        "vectorizer_word": os.path.join(staging, registry.VECTORIZER_WORD_FILE),
+        "vectorizer_char": os.path.join(staging, registry.VECTORIZER_CHAR_FILE),
+    }
+    import joblib
+
+    joblib.dump(clf, paths["model"])
+    joblib.dump(vectorizer_word, paths["vectorizer_word"])
+    joblib.dump(vectorizer_char, paths["vectorizer_char"])
+    export_scorer(clf, vectorizer_word, vectorizer_char, path=os.path.join(staging, registry.SCORER_DIR),
+                  dtype=scorer_dtype)
+    version = registry.commit_version(
+        staging, metrics=metrics, feature_config=feature_config(vectorizer_word, vectorizer_char), dataset=dataset
+    )
+    print(f"✅ Saved model version {version}")
+    if activate:
+        registry.activate(version, check=False)
+    registry.prune()
+    return version
+
+
+def export_scorer(clf, vectorizer_word, vectorizer_char, path: str = SCORER_PATH, dtype: str = None,
+                  source_fingerprint: str = None):
+    """Compile the fitted model into the NumPy scorer used at serve time.
+
+    ``source_fingerprint`` (``pickles_fingerprint``) ties a scorer saved next
+    to the flat pickles to them; serving ignores it once they change.
+    """
+    try:
+        scorer = CompiledScorer.from_sklearn(clf, vectorizer_word, vectorizer_char)
+        if dtype:
+            scorer = scorer.quantized(dtype)
+        scorer.source_fingerprint = source_fingerprint
+    except ValueError as e:
+        print(f"⚠️  Skipping compiled scorer export: {e}")
+        # Never leave a scorer from an older model to shadow the new pickles
+        if os.path.isdir(path):
+            import shutil
+            shutil.rmtree(path)
+        return None
+    scorer.save(path)
+    print(f"✅ Compiled scorer written to {path}")
+    return scorer
+
+
+@dataclass(frozen=True)
+class ServingModel:
+    """One model version as served: the compiled scorer and/or the sklearn objects.
+
+    Never mutated; a reload builds a new instance and swaps the module-level
+    reference, so a request that grabbed one keeps a consistent model.
+    """
+    version: Optional[str] = None
+    scorer: Optional[CompiledScorer] = None
+    model: Optional[tuple] = None
+    # Identifies the model in prediction cache keys
+    fingerprint: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.scorer is not None or self.model is not None
+
+
+_serving = ServingModel()
+_load_lock = threading.Lock()
+_watcher_pid = None
+
+
+def _load_pickles(version):
+    import joblib
+
+    paths = registry.artifact_paths(version)
+    pickles = (paths["model"], paths["vectorizer_word"], paths["vectorizer_char"])
+    if version is None and not all(os.path.exists(p) for p in pickles):
         print("⚠️  Model files not found. Downloading...")
         try:
             from src.scripts.download_assets import download_models
@@ -191,55 +369,464 @@ def load_model():
                 "Model files not found and download failed. "
                 "Please ensure models are uploaded to remote storage."
             )
-    
-    # Load models
     try:
-        clf = joblib.load(MODEL_PATH)
-        vectorizer_word = joblib.load(VECTORIZER_WORD_PATH)
-        vectorizer_char = joblib.load(VECTORIZER_CHAR_PATH)
-        
-        # Cache for future requests
-        _model_cache = (clf, vectorizer_word, vectorizer_char)
+        with MODEL_LOAD_SECONDS.time("pickles"):
+            model = (joblib.load(paths["model"]), joblib.load(paths["vectorizer_word"]),
+                     joblib.load(paths["vectorizer_char"]))
         print("✅ Models loaded successfully")
-        
-        return _model_cache
+        return model
     except Exception as e:
         print(f"❌ Error loading models: {e}")
         raise
 
 
-def predict(text: str):
-    import numpy as np
+def _load_version(version, with_model: bool = False) -> ServingModel:
+    """Load a version: the compiled scorer when available, the pickles when needed."""
+    scorer = None
+    scorer_path = registry.artifact_paths(version)["scorer"]
+    if USE_COMPILED_SCORER and os.path.isdir(scorer_path):
+        try:
+            with MODEL_LOAD_SECONDS.time("scorer"):
+                scorer = CompiledScorer.load(scorer_path)
+            print("✅ Compiled scorer loaded successfully")
+        except Exception as e:
+            print(f"❌ Error loading compiled scorer, falling back to pickles: {e}")
+    # Flat files have no manifest: the scorer must name the pickles it was compiled from
+    if scorer is not None and version is None and scorer.source_fingerprint != pickles_fingerprint(None):
+        print("⚠️  Compiled scorer does not match the model pickles, ignoring it "
+              "(re-export it with python -m src.ml.scorer)")
+        scorer = None
+    model = _load_pickles(version) if with_model or scorer is None else None
+    return ServingModel(version, scorer, model, _fingerprint(version))
 
-    clf, vectorizer_word, vectorizer_char = load_model()
-    cleaned = clean_text(text)
-    X_word = vectorizer_word.transform([cleaned])
-    X_char = vectorizer_char.transform([cleaned])
-    X_text = hstack([X_word, X_char])
 
-    s = sentiment_features(cleaned)
-    # Compute style features for the input on RAW text
-    total = max(len(text), 1)
-    exclam = text.count('!') / total
-    letters = sum(1 for c in text if c.isalpha())
-    upper = (sum(1 for c in text if c.isupper()) / max(letters, 1)) if letters else 0.0
-    punct = (sum(1 for c in text if c in string.punctuation) / total)
+def _fingerprint(version) -> str:
+    """The version name, or for the flat (unversioned) files a digest of their sizes and mtimes."""
+    if version is not None:
+        return version
+    return "flat-" + _stat_digest(registry.artifact_paths(None).values())
 
-    small_feats = csr_matrix(np.array([[s.polarity, s.subjectivity, exclam, upper, punct]]))
-    X = hstack([X_text, small_feats])
 
-    proba = clf.predict_proba(X)[0]
-    label = int(np.argmax(proba))
-    return {
-        "label": label,
-        "prob_fake": float(proba[1]) if len(proba) > 1 else float(proba[0]),
-        "sentiment": {"polarity": s.polarity, "subjectivity": s.subjectivity},
-    }
+def pickles_fingerprint(version) -> str:
+    """Digest of the contents of a version's three model pickles.
+
+    Content, not mtimes: copies, checkouts and image rebuilds keep a flat
+    compiled scorer valid as long as the pickles are the same bytes.
+    """
+    paths = registry.artifact_paths(version)
+    hashes = [(name, registry.sha256_file(paths[name]) if os.path.exists(paths[name]) else None)
+              for name in ("model", "vectorizer_word", "vectorizer_char")]
+    return hashlib.blake2b(repr(hashes).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _stat_digest(paths) -> str:
+    stats = []
+    for path in paths:
+        path = os.path.join(path, "meta.json") if os.path.isdir(path) else path
+        if os.path.exists(path):
+            st = os.stat(path)
+            stats.append((os.path.basename(path), st.st_size, st.st_mtime_ns))
+    return hashlib.blake2b(repr(stats).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def get_serving_model(with_model: bool = False) -> ServingModel:
+    """The model currently being served, loading the active version on first use."""
+    global _serving
+    _ensure_watcher()
+    current = _serving
+    if current.loaded and (current.model is not None or not with_model):
+        return current
+    with _load_lock:
+        current = _serving
+        if not current.loaded:
+            current = _load_version(registry.active_version(), with_model)
+        elif with_model and current.model is None:
+            current = replace(current, model=_load_pickles(current.version))
+        _serving = current
+        return current
+
+
+def model_loaded() -> bool:
+    """Whether a model is being served yet (never triggers a load)."""
+    return _serving.loaded
+
+
+def load_model():
+    """Load model with caching and automatic download if missing."""
+    return get_serving_model(with_model=True).model
+
+
+def load_scorer():
+    """Compiled NumPy scorer of the served version, or None if it has none.
+
+    When available it replaces the sklearn vectorizers/classifier at serve
+    time, so the pickles (and scikit-learn) are never loaded.
+    """
+    return get_serving_model().scorer
+
+
+def reload_if_updated() -> bool:
+    """Load the registry's active version if it differs from the served one, then swap it in.
+
+    The new version is loaded completely first and published with a single
+    reference assignment, so requests in flight finish on the model they
+    started with and new requests never wait for a load. A version that fails
+    to load is logged and the current one keeps serving.
+    Returns True if a new version was swapped in.
+    """
+    global _serving
+    current = _serving
+    version = registry.active_version()
+    if not current.loaded or version == current.version:
+        return False
+    try:
+        if version is not None:
+            registry.verify(version)
+        new = _load_version(version, with_model=current.model is not None)
+    except Exception as e:
+        print(f"❌ Could not load model version {version}, still serving {current.version}: {e}")
+        return False
+    with _load_lock:
+        _serving = new
+    # Old results can no longer be looked up (their keys name the old model);
+    # drop this process's copies rather than waiting for them to age out. A
+    # shared sqlite tier is left alone: other workers may still be serving the
+    # old model, and its entries expire through the LRU bound.
+    local = getattr(_prediction_cache, "local", _prediction_cache)
+    if not isinstance(local, SQLiteCache):
+        local.clear()
+    print(f"✅ Now serving model version {version}")
+    return True
+
+
+def _watch_active_version():
+    while True:
+        time.sleep(MODEL_RELOAD_INTERVAL)
+        try:
+            reload_if_updated()
+        except Exception as e:
+            print(f"❌ Model watcher error: {e}")
+
+
+def _ensure_watcher():
+    # Threads do not survive fork, so each gunicorn worker starts its own
+    global _watcher_pid
+    if _watcher_pid == os.getpid() or MODEL_RELOAD_INTERVAL <= 0:
+        return
+    with _load_lock:
+        if _watcher_pid != os.getpid():
+            threading.Thread(target=_watch_active_version, name="model-watcher", daemon=True).start()
+            _watcher_pid = os.getpid()
+
+
+def _cut(text: str, start: int, end: int) -> str:
+    """``text[start:end]`` widened/narrowed to the nearest whitespace so no word is split."""
+    if start > 0:
+        space = text.find(" ", start, min(start + 50, end))
+        start = space + 1 if space >= 0 else start
+    if end < len(text):
+        space = text.rfind(" ", max(end - 50, start), end)
+        end = space if space > start else end
+    return text[start:end]
+
+
+def segment_text(text: str, strategy: str = None, max_chars: int = None):
+    """The part(s) of ``text`` to score under the long-document strategy (see LONG_DOC_STRATEGY)."""
+    strategy = strategy or LONG_DOC_STRATEGY
+    max_chars = max_chars or MAX_DOC_CHARS
+    if strategy not in LONG_DOC_STRATEGIES:
+        raise ValueError(f"Unknown long-document strategy {strategy!r} (choose from {LONG_DOC_STRATEGIES})")
+    if strategy == "full" or len(text) <= max_chars:
+        return [text]
+    if strategy == "truncate":
+        return [_cut(text, 0, max_chars)]
+    if strategy == "head_tail":
+        half = max_chars // 2
+        return [_cut(text, 0, half) + "\n" + _cut(text, len(text) - half, len(text))]
+    # At least the configured number of windows: a budget below MAX_DOC_CHARS
+    # narrows them, so the whole text is still sampled
+    n_windows = min(max(MAX_DOC_CHARS // DOC_WINDOW_CHARS, max_chars // DOC_WINDOW_CHARS, 1), max_chars)
+    window = max_chars // n_windows
+    starts = np.linspace(0, len(text) - window, n_windows).astype(int)
+    return [_cut(text, s, s + window) for s in starts]
+
+
+_feature_names = weakref.WeakKeyDictionary()
+
+
+def _reverse_vocabulary(vectorizer):
+    """Column-ordered n-gram strings of a fitted vectorizer, or None (hashed features)."""
+    try:
+        return _feature_names[vectorizer]
+    except KeyError:
+        pass
+    try:
+        terms = vectorizer.get_feature_names_out()
+    except Exception:
+        terms = None
+    _feature_names[vectorizer] = terms
+    return terms
+
+
+def _merge_windows(doc_ids, cols, values, row_text, counts):
+    """Average per-row contributions over the windows of each text."""
+    n_cols = int(cols.max()) + 1 if len(cols) else 1
+    keys, inverse = np.unique(row_text[doc_ids] * n_cols + cols, return_inverse=True)
+    text_ids = keys // n_cols
+    return text_ids, keys % n_cols, np.bincount(inverse, weights=values) / counts[text_ids]
+
+
+def _term(terms, col) -> str:
+    """N-gram of a column from a compiled scorer block or a column-ordered array."""
+    if hasattr(terms, "term"):
+        term = terms.term(col)
+    else:
+        term = None if terms is None else str(terms[col])
+    return f"#{col}" if term is None else term
+
+
+def _top_terms(doc_ids, cols, values, n_docs: int, terms, top_k: int):
+    """Per document, the ``top_k`` n-grams with the largest absolute contribution.
+
+    ``doc_ids`` must be sorted; ``terms`` maps columns to n-grams (see ``_term``).
+    Zero contributions (pruned n-grams) are left out.
+    """
+    bounds = np.searchsorted(doc_ids, np.arange(n_docs + 1))
+    out = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        v = values[lo:hi]
+        idx = np.argpartition(-np.abs(v), top_k)[:top_k] if len(v) > top_k else np.arange(len(v))
+        idx = idx[v[idx] != 0]
+        idx = idx[np.argsort(-np.abs(v[idx]))]
+        out.append([
+            {"feature": _term(terms, c), "contribution": float(x)}
+            for c, x in zip(cols[lo:hi][idx], v[idx])
+        ])
+    return out
+
+
+def _explanations(parts, small, intercept, terms, n_texts, top_k, row_text=None, counts=None):
+    """Explanation dict per text from the decision function's per-feature terms.
+
+    ``parts`` holds the ``(doc_ids, cols, values)`` n-gram terms of the word and
+    char blocks and the (rows, 5) dense-feature terms; ``row_text``/``counts``
+    map windowed rows back to their texts.
+    """
+    if row_text is not None:
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+        parts = {
+            "word": _merge_windows(*parts["word"], row_text, counts),
+            "char": _merge_windows(*parts["char"], row_text, counts),
+            "small": np.add.reduceat(parts["small"], starts) / counts[:, None],
+        }
+        small = np.add.reduceat(small, starts) / counts[:, None]
+    word = _top_terms(*parts["word"], n_texts, terms[0], top_k)
+    char = _top_terms(*parts["char"], n_texts, terms[1], top_k)
+    names = SMALL_FEATURE_NAMES if small.shape[1] == len(SMALL_FEATURE_NAMES) else range(small.shape[1])
+    explanations = []
+    for i in range(n_texts):
+        features = sorted(
+            ({"feature": str(name), "value": float(v), "contribution": float(c)}
+             for name, v, c in zip(names, small[i], parts["small"][i])),
+            key=lambda f: -abs(f["contribution"]),
+        )
+        explanations.append({"intercept": intercept, "word_ngrams": word[i], "char_ngrams": char[i],
+                             "features": features})
+    return explanations
+
+
+def predict(text: str, explain: bool = False, top_k: int = None):
+    return predict_batch([text], explain=explain, top_k=top_k)[0]
+
+
+def predict_batch(texts, strategy: str = None, max_chars: int = None, explain: bool = False, top_k: int = None,
+                  serving: ServingModel = None):
+    """Score a list of texts in one pass.
+
+    Both vectorizers and ``predict_proba`` run once over the whole batch
+    instead of once per text, which amortises the per-call overhead.
+    Texts longer than ``max_chars`` (MAX_DOC_CHARS) are cut down by the
+    long-document ``strategy`` (LONG_DOC_STRATEGY) first; with ``windows``
+    each window is a row of the batch and its probabilities and sentiment
+    are averaged per text. Results are returned in input order with the
+    same shape as ``predict``.
+
+    Results are cached by text and model (see PREDICT_CACHE_*); only texts
+    not in the cache are scored, each distinct text once.
+
+    ``serving`` is the model to score with (default: the one being served);
+    pass a ``get_serving_model()`` snapshot to know which version produced
+    the results across a reload.
+
+    With ``explain`` each result also has an ``explanation``: the ``top_k``
+    (EXPLAIN_TOP_K) word and char n-grams with the largest contribution to
+    the decision function, and every dense feature's value and contribution.
+    Contributions are read off the sparse rows already computed for scoring;
+    positive ones push towards fake.
+    """
+    texts = [t or "" for t in texts]
+    if not texts:
+        return []
+    serving = serving or get_serving_model()
+    if explain and serving.scorer is not None and serving.scorer.word.terms is None:
+        # Scorer compiled without its vocabulary: take the n-grams from the pickles
+        # (of the same model, should a reload have happened since the snapshot)
+        with_model = get_serving_model(with_model=True)
+        serving = with_model if with_model.fingerprint == serving.fingerprint else \
+            replace(serving, model=_load_pickles(serving.version))
+    if _prediction_cache.max_entries <= 0:
+        return _predict_texts(serving, texts, strategy, max_chars, explain, top_k)
+
+    # Everything that changes a result goes in the key
+    options = f"{serving.fingerprint}|{strategy or LONG_DOC_STRATEGY}|{max_chars or MAX_DOC_CHARS}|" \
+              f"{int(explain)}|{(top_k or EXPLAIN_TOP_K) if explain else 0}|"
+    results = [None] * len(texts)
+    missing = {}
+    for i, text in enumerate(texts):
+        key = options + hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+        entry = _prediction_cache.get(key)
+        if entry is not None:
+            results[i] = entry.value
+        else:
+            missing.setdefault(key, []).append(i)
+    if missing:
+        scored = _predict_texts(serving, [texts[idx[0]] for idx in missing.values()], strategy, max_chars,
+                                explain, top_k)
+        for (key, idx), result in zip(missing.items(), scored):
+            _prediction_cache.set(key, result)
+            for i in idx:
+                results[i] = result
+    return results
+
+
+def _predict_texts(serving: ServingModel, texts, strategy, max_chars, explain, top_k):
+    """``predict_batch`` without the cache."""
+    segments = [segment_text(t, strategy, max_chars) for t in texts]
+    originals = texts
+    texts = [part for seg in segments for part in seg]
+
+    with time_stage("clean"):
+        cleaned = [clean_text(t) for t in texts]
+    with time_stage("sentiment"):
+        senti = sentiment_features_batch(cleaned)
+    with time_stage("style"):
+        # Style features are computed on RAW text, as in training
+        small = np.array(
+            [[s.polarity, s.subjectivity, *style_features(t)] for s, t in zip(senti, texts)],
+            dtype=np.float64,
+        )
+
+    if serving.scorer is not None:
+        # The compiled scorer vectorizes and scores in one pass
+        scorer = serving.scorer
+        with time_stage("compiled_score"):
+            if explain:
+                decision, parts = scorer.decision_contributions(cleaned, small)
+                proba = scorer.predict_proba_from_decision(decision)
+            else:
+                proba = scorer.predict_proba(cleaned, small)
+        if explain:
+            intercept = scorer.intercept
+            if scorer.word.terms is not None:
+                terms = (scorer.word, scorer.char)
+            else:
+                terms = (_reverse_vocabulary(serving.model[1]), _reverse_vocabulary(serving.model[2]))
+    else:
+        from scipy.sparse import csr_matrix, hstack
+
+        clf, vectorizer_word, vectorizer_char = serving.model
+        with time_stage("vectorize"):
+            X_word = vectorizer_word.transform(cleaned)
+            X_char = vectorizer_char.transform(cleaned)
+            X = hstack([X_word, X_char, csr_matrix(small)], format="csr")
+        with time_stage("predict_proba"):
+            proba = clf.predict_proba(X)
+        if explain:
+            coef = np.asarray(clf.coef_, dtype=np.float64).ravel()
+            n_word, n_char = X_word.shape[1], X_char.shape[1]
+            rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+            values = X.data * coef[X.indices]
+            is_word = X.indices < n_word
+            is_char = ~is_word & (X.indices < n_word + n_char)
+            parts = {
+                "word": (rows[is_word], X.indices[is_word], values[is_word]),
+                "char": (rows[is_char], X.indices[is_char] - n_word, values[is_char]),
+                "small": small * coef[n_word + n_char:],
+            }
+            intercept = float(np.ravel(clf.intercept_)[0])
+            terms = (_reverse_vocabulary(vectorizer_word), _reverse_vocabulary(vectorizer_char))
+
+    windowed = len(texts) > len(originals)
+    counts = np.array([len(seg) for seg in segments])
+    if explain:
+        with time_stage("explain"):
+            explanations = _explanations(
+                parts, small, intercept, terms, len(originals), top_k or EXPLAIN_TOP_K,
+                row_text=np.repeat(np.arange(len(originals)), counts) if windowed else None, counts=counts,
+            )
+
+    if windowed:
+        # Average the windows of each text
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+        proba = np.add.reduceat(proba, starts) / counts[:, None]
+        polarity_subjectivity = np.add.reduceat([[s.polarity, s.subjectivity] for s in senti], starts) / counts[:, None]
+        senti = [SentimentResult(float(p), float(sj)) for p, sj in polarity_subjectivity]
+
+    results = []
+    for i, (p, s, original, seg) in enumerate(zip(proba, senti, originals, segments)):
+        result = {
+            "label": int(np.argmax(p)),
+            "prob_fake": float(p[1]) if len(p) > 1 else float(p[0]),
+            "sentiment": {"polarity": s.polarity, "subjectivity": s.subjectivity},
+        }
+        if seg[0] is not original:
+            result["long_document"] = {"strategy": strategy or LONG_DOC_STRATEGY, "chars": len(original),
+                                       "chars_scored": sum(len(part) for part in seg), "segments": len(seg)}
+        if explain:
+            result["explanation"] = explanations[i]
+        results.append(result)
+    return results
 
 if __name__ == "__main__":
     import argparse
-    parser = argparse.ArgumentParser(description="Train fake news detector")
+    parser = argparse.ArgumentParser(description="Train fake news detector, or score files with it")
     parser.add_argument("--dataset_csv", type=str, default=os.path.join("src", "data", "kaggle_fake_real_combined.csv"),
                         help="Path to training CSV with columns: text,label (0/1)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Out-of-core training: hashed features + SGD, one chunk in memory at a time")
+    parser.add_argument("--chunksize", type=int, default=5000, help="Rows per chunk in --streaming mode")
+    parser.add_argument("--epochs", type=int, default=1, help="Passes over the CSV in --streaming mode")
+    parser.add_argument("--n_jobs", type=int, default=int(os.environ.get("FEATURE_JOBS", "1")),
+                        help="Processes for text cleaning/sentiment/style extraction (-1 = all cores)")
+    parser.add_argument("--experiments", type=str, default=",".join(EXPERIMENTS),
+                        help=f"Comma-separated experiments to run ({', '.join(EXPERIMENTS)})")
+    parser.add_argument("--train_jobs", type=int, default=TRAIN_JOBS,
+                        help="Processes for CV folds and candidate models (-1 = all cores)")
+    parser.add_argument("--no_feature_cache", action="store_true",
+                        help="Recompute all features instead of reusing the on-disk feature store")
+    commands = parser.add_subparsers(dest="command", metavar="{score}",
+                                     help="score: score a CSV/JSONL file with the active model (default: train)")
+    score = commands.add_parser("score", description="Score a CSV/JSONL file or stdin in batches")
+    score.add_argument("input", help="CSV/JSONL file, or - for stdin")
+    score.add_argument("--output", default="-", help="CSV/JSONL file, or - for stdout (default)")
+    score.add_argument("--input_format", choices=("csv", "jsonl"), help="Default: from the file extension")
+    score.add_argument("--output_format", choices=("csv", "jsonl"), help="Default: from the file extension")
+    score.add_argument("--text_column", default="text")
+    score.add_argument("--id_column", help="Column copied to the output id (default: row number)")
+    score.add_argument("--batch_size", type=int, default=256)
+    score.add_argument("--workers", type=int, default=1, help="Scoring processes (-1 = all cores)")
+    score.add_argument("--strategy", choices=LONG_DOC_STRATEGIES, help="Long document strategy")
+    score.add_argument("--max_chars", type=int, help="Long document character budget")
     args = parser.parse_args()
-    train_model(dataset_csv=args.dataset_csv)
\ No newline at end of file
+    if args.command == "score":
+        from src.ml.scoring import score_file
+
+        score_file(args.input, args.output, input_format=args.input_format, output_format=args.output_format,
+                   text_column=args.text_column, id_column=args.id_column, batch_size=args.batch_size,
+                   workers=args.workers, strategy=args.strategy, max_chars=args.max_chars)
+    elif args.streaming:
+        train_model_streaming(dataset_csv=args.dataset_csv, chunksize=args.chunksize, epochs=args.epochs,
+                              n_jobs=args.n_jobs)
+    else:
+        train_model(dataset_csv=args.dataset_csv, n_jobs=args.n_jobs, feature_cache=not args.no_feature_cache,
+                    experiments=[e for e in args.experiments.split(",") if e], train_jobs=args.train_jobs)
\ No newline at end of file
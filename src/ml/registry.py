@@ -0,0 +1,223 @@
+"""
+Versioned model registry.
+
+Every training run writes a new directory under ``src/ml/artifacts/versions/``::
+
+    versions/<version>/fake_news_model.pkl
+                      tfidf_word_vectorizer.pkl
+                      tfidf_char_vectorizer.pkl
+                      compiled_scorer/               (when exportable)
+                      manifest.json                  sha256 per file, metrics,
+                                                     feature config, dataset
+
+``ACTIVE`` holds the name of the version being served and ``ACTIVE_HISTORY``
+every activation in order, which is what ``rollback`` walks back through.
+Version directories are never modified after they are committed, so a
+version can be loaded while another is being written or activated.
+
+Without an ``ACTIVE`` pointer (e.g. freshly downloaded models) the flat
+pickles in ``src/ml/artifacts/`` are served as before.
+
+Manage versions from the command line::
+
+    python -m src.ml.registry list
+    python -m src.ml.registry activate <version>
+    python -m src.ml.registry rollback
+    python -m src.ml.registry verify [<version>]
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join("src", "ml", "artifacts"))
+VERSIONS_DIR = os.path.join(MODEL_DIR, "versions")
+ACTIVE_PATH = os.path.join(MODEL_DIR, "ACTIVE")
+HISTORY_PATH = os.path.join(MODEL_DIR, "ACTIVE_HISTORY")
+MANIFEST = "manifest.json"
+
+MODEL_FILE = "fake_news_model.pkl"
+VECTORIZER_WORD_FILE = "tfidf_word_vectorizer.pkl"
+VECTORIZER_CHAR_FILE = "tfidf_char_vectorizer.pkl"
+SCORER_DIR = "compiled_scorer"
+
+# Committed versions kept on disk (the active one is never pruned)
+MODEL_KEEP_VERSIONS = int(os.environ.get("MODEL_KEEP_VERSIONS", "5"))
+
+
+class RegistryError(RuntimeError):
+    """Unknown or corrupt model version."""
+
+
+def artifact_paths(version=None) -> dict:
+    """Paths of a version's artifacts; ``None`` means the flat legacy files."""
+    base = MODEL_DIR if version is None else os.path.join(VERSIONS_DIR, version)
+    return {
+        "model": os.path.join(base, MODEL_FILE),
+        "vectorizer_word": os.path.join(base, VECTORIZER_WORD_FILE),
+        "vectorizer_char": os.path.join(base, VECTORIZER_CHAR_FILE),
+        "scorer": os.path.join(base, SCORER_DIR),
+    }
+
+
+def _write_atomic(path: str, text: str):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def active_version():
+    """Name of the version being served, or None when serving the flat files."""
+    try:
+        with open(ACTIVE_PATH) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _file_hashes(directory: str) -> dict:
+    hashes = {}
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, directory)
+            if rel != MANIFEST:
+                hashes[rel] = sha256_file(path)
+    return hashes
+
+
+def staging_dir() -> str:
+    """A fresh directory to write a new version's artifacts into."""
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    path = os.path.join(VERSIONS_DIR, f".staging-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    os.makedirs(path)
+    return path
+
+
+def commit_version(staging: str, metrics=None, feature_config=None, dataset=None) -> str:
+    """Hash the staged artifacts, write the manifest and move them to ``versions/<version>``."""
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    manifest = {
+        "version": version,
+        "created_at": time.time(),
+        "files": _file_hashes(staging),
+        "metrics": metrics or {},
+        "feature_config": feature_config or {},
+        "dataset": dataset or {},
+    }
+    with open(os.path.join(staging, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(staging, os.path.join(VERSIONS_DIR, version))
+    return version
+
+
+def manifest(version: str) -> dict:
+    try:
+        with open(os.path.join(VERSIONS_DIR, version, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise RegistryError(f"Unknown or unreadable model version {version!r}: {e}")
+
+
+def verify(version: str):
+    """Raise RegistryError unless every file matches the hash in the manifest."""
+    expected = manifest(version)["files"]
+    actual = _file_hashes(os.path.join(VERSIONS_DIR, version))
+    if actual != expected:
+        bad = sorted(name for name in set(expected) | set(actual) if expected.get(name) != actual.get(name))
+        raise RegistryError(f"Model version {version} does not match its manifest: {', '.join(bad)}")
+
+
+def list_versions():
+    """Committed versions, oldest first."""
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    return sorted(name for name in os.listdir(VERSIONS_DIR)
+                  if not name.startswith(".") and os.path.exists(os.path.join(VERSIONS_DIR, name, MANIFEST)))
+
+
+def activate(version: str, check: bool = True):
+    """Point ACTIVE at ``version``; serving processes pick it up in the background."""
+    if check:
+        verify(version)
+    else:
+        manifest(version)
+    _write_atomic(ACTIVE_PATH, version)
+    with open(HISTORY_PATH, "a") as f:
+        f.write(f"{version}\n")
+    print(f"✅ Activated model version {version}")
+
+
+def rollback() -> str:
+    """Re-activate the version that was active before the current one."""
+    current = active_version()
+    try:
+        with open(HISTORY_PATH) as f:
+            history = [line.strip() for line in f if line.strip()]
+    except OSError:
+        history = []
+    available = set(list_versions())
+    for version in reversed(history):
+        if version != current and version in available:
+            activate(version)
+            return version
+    raise RegistryError("No earlier model version to roll back to")
+
+
+def prune(keep: int = MODEL_KEEP_VERSIONS):
+    """Delete all but the newest ``keep`` versions, never the active one, plus abandoned staging dirs."""
+    active = active_version()
+    versions = list_versions()
+    for version in versions[:max(len(versions) - keep, 0)]:
+        if version != active:
+            shutil.rmtree(os.path.join(VERSIONS_DIR, version), ignore_errors=True)
+    for name in os.listdir(VERSIONS_DIR) if os.path.isdir(VERSIONS_DIR) else []:
+        path = os.path.join(VERSIONS_DIR, name)
+        if name.startswith(".staging-") and time.time() - os.path.getmtime(path) > 24 * 3600:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage TruthGuard model versions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List versions with their test metrics")
+    p = sub.add_parser("activate", help="Serve a version")
+    p.add_argument("version")
+    sub.add_parser("rollback", help="Serve the previously active version")
+    p = sub.add_parser("verify", help="Check a version's files against its manifest")
+    p.add_argument("version", nargs="?")
+    p = sub.add_parser("prune", help="Delete old versions")
+    p.add_argument("--keep", type=int, default=MODEL_KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        active = active_version()
+        for version in list_versions():
+            metrics = manifest(version).get("metrics", {})
+            acc = metrics.get("full", {}).get("accuracy")
+            print(f"{'*' if version == active else ' '} {version}" + (f"  accuracy={acc:.4f}" if acc is not None else ""))
+    elif args.command == "activate":
+        activate(args.version)
+    elif args.command == "rollback":
+        rollback()
+    elif args.command == "verify":
+        version = args.version or active_version()
+        if version is None:
+            parser.error("no active version; pass one explicitly")
+        verify(version)
+        print(f"✅ {version} matches its manifest")
+    elif args.command == "prune":
+        prune(args.keep)
@@ -0,0 +1,385 @@
+"""
+Compiled NumPy scorer for the TF-IDF + logistic regression model.
+
+``CompiledScorer.from_sklearn`` turns the fitted word/char ``TfidfVectorizer``
+pair and the ``LogisticRegression`` into a handful of flat arrays:
+
+* each vocabulary becomes a sorted array of 64-bit n-gram hashes plus the
+  column each hash maps to (no Python dict of strings at serve time)
+* idf and idf*coef are precomputed per column, so a document's score is a
+  gather + dot product over the n-grams it actually contains
+* the n-gram strings are kept as a column-ordered array (the reverse
+  vocabulary), only read when a prediction is explained
+
+``CompiledScorer.quantized`` stores the same arrays in hash order, so the
+column map is dropped, with idf and weights as float32/float16 (weights also
+as int8 times a per-block scale). N-grams whose coefficient is zero (e.g.
+pruned by ``src/ml/compress.py``) keep their hash and idf, since they still
+count towards a document's TF-IDF norm, but not their string.
+
+N-gram hashes are a polynomial hash mod 2**64 computed with vectorized prefix
+sums over the document's code points, so tokenisation into n-grams never
+builds Python strings. This module only needs NumPy; scikit-learn is
+imported by the caller when exporting, never when scoring.
+
+Saved scorers are a directory of plain ``.npy`` files that ``load`` memory-maps,
+so forked or independent workers share the arrays instead of each holding a copy.
+"""
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+_BASE = 1099511628211  # odd, so it is invertible mod 2**64
+_BASE_INV = pow(_BASE, -1, 2 ** 64)
+_SPACE = ord(" ") + 1
+_WHITE_SPACES = re.compile(r"\s\s+")  # same normalisation as sklearn's char analyzer
+_BLOCK_ARRAYS = ("keys", "idf", "weights")
+# Optional: scorers compiled before explanations existed have no terms, and
+# quantized scorers keep every array in hash order instead of mapping to
+# columns, with terms only for the columns in term_cols
+_BLOCK_OPTIONAL_ARRAYS = ("cols", "terms", "term_cols")
+QUANTIZED_DTYPES = ("float64", "float32", "float16", "int8")
+
+
+def _pow_table(base: int, n: int) -> np.ndarray:
+    out = np.full(n, base, dtype=np.uint64)
+    if n:
+        out[0] = 1
+        np.cumprod(out, out=out)
+    return out
+
+
+class _Hasher:
+    """Substring hashes of one document: hash(i, n) for text[i:i+n]."""
+
+    def __init__(self, text: str):
+        cp = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64) + np.uint64(1)
+        self.length = len(cp)
+        self.pw = _pow_table(_BASE, self.length + 1)
+        prefix = np.zeros(self.length + 1, dtype=np.uint64)
+        np.cumsum(cp * _pow_table(_BASE_INV, self.length), out=prefix[1:])
+        self.prefix = prefix
+
+    def substrings(self, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        ends = starts + lengths
+        return self.pw[ends - 1] * (self.prefix[ends] - self.prefix[starts])
+
+
+def hash_string(s: str) -> int:
+    """Hash of a whole string, consistent with the per-document n-gram hashes."""
+    if not s:
+        return 0
+    return int(_Hasher(s).substrings(np.array([0]), np.array([len(s)]))[0])
+
+
+class _Block:
+    """One vectorizer: analyzer config, sorted hash vocabulary and per-column weights."""
+
+    def __init__(self, meta: dict, keys, cols, idf, weights, terms=None, term_cols=None):
+        self.meta = meta
+        self.analyzer = meta["analyzer"]
+        self.min_n, self.max_n = meta["ngram_range"]
+        self.lowercase = meta["lowercase"]
+        self.sublinear_tf = meta["sublinear_tf"]
+        self.norm = meta["norm"]
+        # int8 weights are stored as round(weight / scale)
+        self.weight_scale = meta.get("weight_scale")
+        self.token_re = re.compile(meta["token_pattern"]) if self.analyzer == "word" else None
+        self.keys = keys
+        self.cols = cols
+        self.idf = idf
+        self.weights = weights
+        self.terms = terms
+        self.term_cols = term_cols
+
+    def ngram_hashes(self, doc: str) -> np.ndarray:
+        if self.lowercase:
+            doc = doc.lower()
+        if self.analyzer == "char":
+            doc = _WHITE_SPACES.sub(" ", doc)
+            hasher = _Hasher(doc)
+            parts = []
+            for n in range(self.min_n, min(self.max_n, hasher.length) + 1):
+                starts = np.arange(hasher.length - n + 1)
+                parts.append(hasher.substrings(starts, np.full(len(starts), n)))
+            return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+
+        group = 1 if self.token_re.groups == 1 else 0
+        spans = np.array([m.span(group) for m in self.token_re.finditer(doc)], dtype=np.int64).reshape(-1, 2)
+        if not len(spans):
+            return np.empty(0, dtype=np.uint64)
+        hasher = _Hasher(doc)
+        lengths = spans[:, 1] - spans[:, 0]
+        tokens = hasher.substrings(spans[:, 0], lengths)
+        space = np.uint64(_SPACE)
+        parts = [tokens] if self.min_n == 1 else []
+        # Grow n-grams one token at a time: hash("a b") = hash("a")*B^(len(b)+1) + ' '*B^len(b) + hash("b")
+        grams = tokens
+        for n in range(2, min(self.max_n, len(tokens)) + 1):
+            nxt, nxt_len = tokens[n - 1:], lengths[n - 1:]
+            grams = grams[:-1] * hasher.pw[nxt_len + 1] + space * hasher.pw[nxt_len] + nxt
+            if n >= self.min_n:
+                parts.append(grams)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+
+    def contributions(self, docs):
+        """The nonzero terms of each document's dot product with the coefficients.
+
+        Returns ``(doc_ids, cols, values)``, sorted by document then column:
+        ``values`` is the normalised TF-IDF weight of ``cols`` times its coefficient.
+        """
+        n_docs = len(docs)
+        hashes = [self.ngram_hashes(d) for d in docs]
+        doc_ids = np.repeat(np.arange(n_docs), [len(h) for h in hashes])
+        hashes = np.concatenate(hashes) if n_docs else np.empty(0, dtype=np.uint64)
+        if not len(hashes) or not len(self.keys):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+
+        pos = np.searchsorted(self.keys, hashes)
+        pos[pos == len(self.keys)] = 0
+        hit = self.keys[pos] == hashes
+        n_cols = len(self.idf)
+        cols = pos[hit] if self.cols is None else self.cols[pos[hit]]
+        pairs, counts = np.unique(doc_ids[hit] * n_cols + cols, return_counts=True)
+        docs_hit, cols = pairs // n_cols, pairs % n_cols
+
+        tf = 1.0 + np.log(counts) if self.sublinear_tf else counts.astype(np.float64)
+        values = tf * self.weights[cols]
+        if self.weight_scale:
+            values *= self.weight_scale
+        if self.norm is None:
+            return docs_hit, cols, values
+        tfidf = tf * self.idf[cols]
+        if self.norm == "l2":
+            norms = np.sqrt(np.bincount(docs_hit, weights=tfidf * tfidf, minlength=n_docs))
+        else:
+            norms = np.bincount(docs_hit, weights=np.abs(tfidf), minlength=n_docs)
+        norms = norms[docs_hit]
+        np.divide(values, norms, out=values, where=norms > 0)
+        return docs_hit, cols, values
+
+    def term(self, col: int):
+        """The n-gram of a column, None if unknown (no terms saved, or a zero-weight column)."""
+        if self.terms is None:
+            return None
+        if self.term_cols is not None:
+            i = int(np.searchsorted(self.term_cols, col))
+            if i == len(self.term_cols) or self.term_cols[i] != col:
+                return None
+            col = i
+        term = self.terms[col]
+        # Quantized scorers store the n-grams as UTF-8 bytes
+        return term.decode("utf-8") if isinstance(term, bytes) else str(term)
+
+    def quantized(self, dtype: str) -> "_Block":
+        """This block in hash order (no column map) with idf and weights stored as ``dtype``."""
+        if dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}; expected one of {', '.join(QUANTIZED_DTYPES)}")
+        idf_dtype = "float16" if dtype == "int8" else dtype
+        order = np.arange(len(self.keys)) if self.cols is None else np.asarray(self.cols)
+        weights = np.asarray(self.weights, dtype=np.float64)[order]
+        if self.weight_scale:
+            weights = weights * self.weight_scale
+        meta = {k: v for k, v in self.meta.items() if k != "weight_scale"}
+        meta["dtype"] = dtype
+        if dtype == "int8":
+            scale = float(np.abs(weights).max()) / 127 if len(weights) else 0.0
+            meta["weight_scale"] = scale or 1.0
+            weights = np.round(weights / meta["weight_scale"]).astype(np.int8)
+        else:
+            weights = weights.astype(dtype)
+        terms = term_cols = None
+        if self.terms is not None:
+            # Zero-weight n-grams never show up in an explanation
+            term_cols = np.flatnonzero(weights).astype(np.int32)
+            terms = np.array([self.term(int(c)) or "" for c in order[term_cols]], dtype=str)
+            # UTF-8 bytes take a quarter of the space of NumPy's UTF-32 strings
+            terms = np.char.encode(terms, "utf-8")
+        return _Block(meta, np.asarray(self.keys), None, np.asarray(self.idf)[order].astype(idf_dtype),
+                      weights, terms, term_cols)
+
+    def scores(self, docs) -> np.ndarray:
+        """Per-document dot product of the normalised TF-IDF row with the coefficients."""
+        docs_hit, _, values = self.contributions(docs)
+        return np.bincount(docs_hit, weights=values, minlength=len(docs))
+
+
+def _export_block(vectorizer, coef: np.ndarray):
+    """Compile one fitted TfidfVectorizer and its slice of the coefficients."""
+    if vectorizer.analyzer not in ("word", "char"):
+        raise ValueError(f"Unsupported analyzer: {vectorizer.analyzer!r}")
+    if vectorizer.strip_accents or vectorizer.preprocessor or vectorizer.tokenizer:
+        raise ValueError("Custom preprocessing is not supported by the compiled scorer")
+    if vectorizer.analyzer == "word" and vectorizer.stop_words is not None:
+        raise ValueError("Stop-word filtering is not supported by the compiled scorer")
+    if vectorizer.binary or vectorizer.norm not in ("l2", "l1", None):
+        raise ValueError("Only non-binary, l1/l2/unnormalised TF-IDF is supported")
+
+    terms = sorted(vectorizer.vocabulary_.items(), key=lambda kv: kv[1])
+    hashes = np.array([hash_string(t) for t, _ in terms], dtype=np.uint64)
+    order = np.argsort(hashes)
+    keys = hashes[order]
+    if len(keys) > 1 and np.any(keys[1:] == keys[:-1]):
+        raise ValueError("Hash collision inside the vocabulary; cannot compile")
+
+    idf = np.asarray(vectorizer.idf_, dtype=np.float64) if vectorizer.use_idf else np.ones(len(terms))
+    meta = {
+        "analyzer": vectorizer.analyzer,
+        "ngram_range": list(vectorizer.ngram_range),
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "sublinear_tf": bool(vectorizer.sublinear_tf),
+        "norm": vectorizer.norm,
+    }
+    return meta, {"keys": keys, "cols": order.astype(np.int32), "idf": idf, "weights": idf * coef,
+                  "terms": np.array([t for t, _ in terms], dtype=str)}
+
+
+class CompiledScorer:
+    """NumPy-only equivalent of ``clf.predict_proba(hstack([word, char, small_feats]))``."""
+
+    def __init__(self, word: _Block, char: _Block, small_coef, intercept: float, proba_scale: float = 1.0,
+                 source_fingerprint: str = None):
+        self.word = word
+        self.char = char
+        self.small_coef = np.asarray(small_coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.proba_scale = float(proba_scale)
+        # Identifies the pickles this was compiled from, when saved next to them
+        self.source_fingerprint = source_fingerprint
+
+    @classmethod
+    def from_sklearn(cls, clf, vectorizer_word, vectorizer_char):
+        """Compile a fitted binary LogisticRegression and its two vectorizers."""
+        if len(getattr(clf, "classes_", [])) != 2 or not hasattr(clf, "coef_"):
+            raise ValueError("Only binary linear classifiers can be compiled")
+        for vectorizer in (vectorizer_word, vectorizer_char):
+            if not hasattr(vectorizer, "vocabulary_") or not hasattr(vectorizer, "idf_"):
+                raise ValueError(f"{type(vectorizer).__name__} has no fitted TF-IDF vocabulary to compile")
+        coef = np.asarray(clf.coef_, dtype=np.float64).ravel()
+        n_word, n_char = len(vectorizer_word.vocabulary_), len(vectorizer_char.vocabulary_)
+        word_meta, word_arrays = _export_block(vectorizer_word, coef[:n_word])
+        char_meta, char_arrays = _export_block(vectorizer_char, coef[n_word:n_word + n_char])
+        # Mirror LogisticRegression.predict_proba: one-vs-rest uses sigmoid(d),
+        # binary multinomial uses softmax([-d, d]) == sigmoid(2d)
+        ovr = getattr(clf, "multi_class", "ovr") in ("ovr", "warn", "auto")
+        return cls(
+            _Block(word_meta, **word_arrays),
+            _Block(char_meta, **char_arrays),
+            coef[n_word + n_char:],
+            float(np.ravel(clf.intercept_)[0]),
+            1.0 if ovr else 2.0,
+        )
+
+    def quantized(self, dtype: str) -> "CompiledScorer":
+        """A smaller copy with n-gram idf and weights stored as ``dtype`` (float32, float16 or int8)."""
+        return CompiledScorer(self.word.quantized(dtype), self.char.quantized(dtype), self.small_coef,
+                              self.intercept, self.proba_scale)
+
+    def save(self, path: str):
+        """Write the scorer as a directory of raw ``.npy`` arrays plus ``meta.json``.
+
+        The directory is built next to ``path`` and renamed into place, so a
+        process that already mapped the previous version keeps reading its
+        (unlinked) files undisturbed.
+        """
+        meta = {
+            "format": 1,
+            "word": self.word.meta,
+            "char": self.char.meta,
+            "intercept": self.intercept,
+            "proba_scale": self.proba_scale,
+        }
+        if self.source_fingerprint is not None:
+            meta["source_fingerprint"] = self.source_fingerprint
+        tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "small_coef.npy"), self.small_coef)
+        for name, block in (("word", self.word), ("char", self.char)):
+            for field in _BLOCK_ARRAYS + _BLOCK_OPTIONAL_ARRAYS:
+                if getattr(block, field) is None:
+                    continue
+                np.save(os.path.join(tmp, f"{name}_{field}.npy"), np.ascontiguousarray(getattr(block, field)))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        old = f"{path}.old-{os.getpid()}"
+        if os.path.isdir(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        """Load a saved scorer. With ``mmap`` the arrays are memory-mapped read-only,
+        so every process on the host shares one copy through the page cache."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+
+        def arr(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+
+        def optional(name):
+            return arr(name) if os.path.exists(os.path.join(path, f"{name}.npy")) else None
+
+        blocks = {
+            name: _Block(meta[name], **{f: arr(f"{name}_{f}") for f in _BLOCK_ARRAYS},
+                         **{f: optional(f"{name}_{f}") for f in _BLOCK_OPTIONAL_ARRAYS})
+            for name in ("word", "char")
+        }
+        return cls(blocks["word"], blocks["char"], arr("small_coef"), meta["intercept"], meta.get("proba_scale", 1.0),
+                   meta.get("source_fingerprint"))
+
+    def decision_function(self, cleaned, small_feats) -> np.ndarray:
+        small_feats = np.asarray(small_feats, dtype=np.float64).reshape(len(cleaned), -1)
+        return (self.word.scores(cleaned) + self.char.scores(cleaned)
+                + small_feats @ self.small_coef + self.intercept)
+
+    def decision_contributions(self, cleaned, small_feats):
+        """``decision_function`` together with the per-feature terms it sums.
+
+        Returns ``(decision, {"word": (doc_ids, cols, values), "char": ..., "small": (n, k) array})``;
+        the n-gram terms are those of ``_Block.contributions``.
+        """
+        n = len(cleaned)
+        small_feats = np.asarray(small_feats, dtype=np.float64).reshape(n, -1)
+        word, char = self.word.contributions(cleaned), self.char.contributions(cleaned)
+        # Summed exactly as in decision_function, so explaining never changes a score
+        decision = (np.bincount(word[0], weights=word[2], minlength=n)
+                    + np.bincount(char[0], weights=char[2], minlength=n)
+                    + small_feats @ self.small_coef + self.intercept)
+        return decision, {"word": word, "char": char, "small": small_feats * self.small_coef}
+
+    def predict_proba_from_decision(self, decision) -> np.ndarray:
+        p = 1.0 / (1.0 + np.exp(-self.proba_scale * decision))
+        return np.column_stack([1.0 - p, p])
+
+    def predict_proba(self, cleaned, small_feats) -> np.ndarray:
+        """Class probabilities, shape (n, 2), matching ``clf.predict_proba``."""
+        return self.predict_proba_from_decision(self.decision_function(cleaned, small_feats))
+
+    def score(self, text: str) -> float:
+        """Probability that a raw article text is fake."""
+        from src.utils.preprocess import clean_text, style_features
+        from src.utils.sentiment import sentiment_features
+
+        cleaned = clean_text(text or "")
+        s = sentiment_features(cleaned)
+        feats = [[s.polarity, s.subjectivity, *style_features(text or "")]]
+        return float(self.predict_proba([cleaned], feats)[0, 1])
+
+
+if __name__ == "__main__":
+    # Compile existing pickles (e.g. freshly downloaded ones) without retraining
+    import joblib
+    from src.ml.pipeline import (MODEL_PATH, VECTORIZER_WORD_PATH, VECTORIZER_CHAR_PATH, export_scorer,
+                                 pickles_fingerprint)
+
+    source = pickles_fingerprint(None)
+    export_scorer(joblib.load(MODEL_PATH), joblib.load(VECTORIZER_WORD_PATH), joblib.load(VECTORIZER_CHAR_PATH),
+                  source_fingerprint=source)
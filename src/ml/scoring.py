@@ -0,0 +1,148 @@
+"""
+Offline batch scoring: ``python -m src.ml.pipeline score``.
+
+Rows stream from a CSV or JSONL file (or stdin) in batches of ``batch_size``;
+each batch is scored with ``predict_batch`` in a process pool whose workers
+load the model once, and results are written to JSONL or CSV as each batch
+comes back, in input order. At most ``2 * workers`` batches are in flight, so
+memory stays flat however large the input is.
+
+    python -m src.ml.pipeline score archive.jsonl --output scores.jsonl --workers 4
+    zcat archive.csv.gz | python -m src.ml.pipeline score - --input_format csv --output - > scores.csv
+"""
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+OUTPUT_FIELDS = ("id", "label", "prob_fake", "polarity", "subjectivity", "model_version")
+
+
+def _format_of(path: str, explicit: str = None) -> str:
+    if explicit:
+        return explicit
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path!r}; pass --input_format/--output_format")
+
+
+def _open(path: str, mode: str):
+    if path == "-":
+        # Left open on exit: the caller may keep using stdio
+        return contextlib.nullcontext(sys.stdin if "r" in mode else sys.stdout)
+    return open(path, mode, newline="" if "b" not in mode else None, encoding="utf-8")
+
+
+def read_records(f, fmt: str, text_column: str = "text", id_column: str = None):
+    """Yield ``(id, text)`` per input row; ``id`` is ``id_column`` or the 0-based row number.
+
+    A missing or null text is scored as ""; JSON numbers and other non-string
+    values are scored as their ``str()``.
+    """
+    if fmt == "csv":
+        csv.field_size_limit(sys.maxsize)
+        rows = csv.DictReader(f)
+    else:
+        rows = (json.loads(line) for line in f if line.strip())
+    for i, row in enumerate(rows):
+        text = row.get(text_column)
+        yield (row.get(id_column) if id_column else i), "" if text is None else str(text)
+
+
+def _init_worker():
+    from src.ml.pipeline import get_serving_model
+
+    get_serving_model()
+
+
+def _init_pool_worker():
+    # Model loading logs to stdout, which may be where the results go
+    sys.stdout = sys.stderr
+    _init_worker()
+
+
+def _score_batch(records, strategy=None, max_chars=None):
+    from src.ml.pipeline import get_serving_model, predict_batch
+
+    # One snapshot for both: a reload between two reads would mislabel the batch
+    serving = get_serving_model()
+    version = serving.version
+    results = predict_batch([text for _, text in records], strategy=strategy, max_chars=max_chars, serving=serving)
+    return [
+        {"id": rid, "label": r["label"], "prob_fake": r["prob_fake"], "polarity": r["sentiment"]["polarity"],
+         "subjectivity": r["sentiment"]["subjectivity"], "model_version": version}
+        for (rid, _), r in zip(records, results)
+    ]
+
+
+def _batches(records, batch_size: int):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _scored_batches(batches, workers: int, strategy=None, max_chars=None):
+    """Score batches in order, with at most ``2 * workers`` in flight."""
+    if workers <= 1:
+        _init_worker()
+        for batch in batches:
+            yield _score_batch(batch, strategy, max_chars)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_worker) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(_score_batch, batch, strategy, max_chars))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def score_file(input_path: str, output_path: str = "-", input_format: str = None, output_format: str = None,
+               text_column: str = "text", id_column: str = None, batch_size: int = 256, workers: int = 1,
+               strategy: str = None, max_chars: int = None, log_every: float = 10.0) -> dict:
+    """Score every row of ``input_path`` into ``output_path`` ("-" for stdin/stdout).
+
+    Progress and the final rows/second go to stderr. Returns the totals.
+    """
+    input_format = _format_of(input_path, input_format)
+    output_format = _format_of(output_path, output_format or (input_format if output_path == "-" else None))
+    if workers < 0:
+        workers = os.cpu_count() or 1
+
+    start = last_log = time.perf_counter()
+    n_rows = 0
+    with _open(input_path, "r") as fin, _open(output_path, "w") as fout, contextlib.redirect_stdout(sys.stderr):
+        writer = csv.DictWriter(fout, fieldnames=OUTPUT_FIELDS) if output_format == "csv" else None
+        if writer:
+            writer.writeheader()
+        records = read_records(fin, input_format, text_column, id_column)
+        for results in _scored_batches(_batches(records, batch_size), workers, strategy, max_chars):
+            if writer:
+                writer.writerows(results)
+            else:
+                fout.write("".join(json.dumps(r) + "\n" for r in results))
+            fout.flush()
+            n_rows += len(results)
+            now = time.perf_counter()
+            if now - last_log >= log_every:
+                print(f"Scored {n_rows} rows ({n_rows / (now - start):.0f} rows/s)", file=sys.stderr)
+                last_log = now
+
+    elapsed = time.perf_counter() - start
+    totals = {"rows": n_rows, "seconds": elapsed, "rows_per_s": n_rows / elapsed if elapsed else 0.0}
+    print(f"✅ Scored {n_rows} rows in {elapsed:.1f}s ({totals['rows_per_s']:.0f} rows/s)", file=sys.stderr)
+    return totals
@@ -0,0 +1,180 @@
+"""
+Background training jobs for ``POST /train``.
+
+``submit`` records a job and returns immediately; a daemon thread in the
+accepting process runs queued jobs one by one, each in a child process
+(``python -m src.ml.train_jobs <job_id>``) so training memory never lands in
+a web worker. Job state lives in JSON files under TRAIN_JOBS_DIR, so any
+worker can answer ``GET /train/<id>``, and an exclusive file lock makes sure
+only one training run happens at a time across all workers on the host.
+
+At most TRAIN_QUEUE_MAX jobs may wait behind the running one; ``submit``
+raises ``TrainQueueFullError`` beyond that. A finished run activates a new
+version in the model registry, which every worker's watcher then swaps in.
+"""
+import fcntl
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+TRAIN_JOBS_DIR = os.environ.get("TRAIN_JOBS_DIR", os.path.join(tempfile.gettempdir(), "truthguard_train_jobs"))
+TRAIN_QUEUE_MAX = int(os.environ.get("TRAIN_QUEUE_MAX", "1"))
+# Finished jobs are forgotten after this many seconds
+TRAIN_JOB_RETENTION = float(os.environ.get("TRAIN_JOB_RETENTION", str(7 * 24 * 3600)))
+TRAIN_DATASET_CSV = os.environ.get("TRAIN_DATASET_CSV", os.path.join("src", "data", "kaggle_fake_real_combined.csv"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_queue = queue.Queue()
+_runner = None
+_runner_lock = threading.Lock()
+
+
+class TrainQueueFullError(RuntimeError):
+    """Too many training jobs are already queued or running."""
+
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(TRAIN_JOBS_DIR, f"{job_id}.json")
+
+
+@contextmanager
+def _flock(name: str):
+    os.makedirs(TRAIN_JOBS_DIR, exist_ok=True)
+    with open(os.path.join(TRAIN_JOBS_DIR, name), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write(job: dict):
+    tmp = f"{_job_path(job['id'])}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp, _job_path(job["id"]))
+
+
+def _pid_alive(pid) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except (OSError, TypeError):
+        return False
+
+
+def _read(job_id: str):
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_job(job_id: str):
+    """The job's state as a dict, or None for an unknown id."""
+    job = _read(job_id)
+    # A job whose owning process died will never finish
+    if job is not None and job["status"] in ACTIVE_STATUSES and not _pid_alive(job.get("pid")):
+        job.update(status="failed", error="training process exited unexpectedly", finished_at=time.time())
+    return job
+
+
+def update_job(job_id: str, **fields):
+    job = _read(job_id)
+    if job is not None:
+        job.update(fields, updated_at=time.time())
+        _write(job)
+
+
+def _active_jobs():
+    """Queued/running jobs; finished ones past TRAIN_JOB_RETENTION are deleted on the way."""
+    if not os.path.isdir(TRAIN_JOBS_DIR):
+        return []
+    active = []
+    for name in os.listdir(TRAIN_JOBS_DIR):
+        job = get_job(name[:-5]) if name.endswith(".json") else None
+        if job is None:
+            continue
+        if job["status"] in ACTIVE_STATUSES:
+            active.append(job)
+        elif time.time() - job.get("finished_at", job["updated_at"]) > TRAIN_JOB_RETENTION:
+            os.remove(_job_path(job["id"]))
+    return active
+
+
+def submit(dataset_csv: str = None) -> dict:
+    """Queue a training run and return its job record without waiting."""
+    with _flock("queue.lock"):
+        if len(_active_jobs()) > TRAIN_QUEUE_MAX:
+            raise TrainQueueFullError(f"{TRAIN_QUEUE_MAX + 1} training jobs already queued or running")
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "status": "queued",
+            "stage": None,
+            "dataset_csv": dataset_csv or TRAIN_DATASET_CSV,
+            "pid": os.getpid(),
+            "created_at": now,
+            "updated_at": now,
+        }
+        _write(job)
+    _ensure_runner()
+    _queue.put(job["id"])
+    return job
+
+
+def _ensure_runner():
+    # One runner thread per process, restarted after fork
+    global _runner
+    with _runner_lock:
+        if _runner is None or not _runner.is_alive():
+            _runner = threading.Thread(target=_run_queue, name="train-jobs", daemon=True)
+            _runner.start()
+
+
+def _run_queue():
+    while True:
+        job_id = _queue.get()
+        try:
+            with _flock("train.lock"):
+                update_job(job_id, status="running", started_at=time.time())
+                proc = subprocess.run([sys.executable, "-m", "src.ml.train_jobs", job_id])
+            job = _read(job_id)
+            if job is not None and job["status"] in ACTIVE_STATUSES:
+                update_job(job_id, status="failed", finished_at=time.time(),
+                           error=f"training process exited with code {proc.returncode}")
+        except Exception as e:
+            print(f"❌ Training job {job_id} failed: {e}")
+            update_job(job_id, status="failed", error=str(e), finished_at=time.time())
+
+
+def _run_job(job_id: str):
+    """Child-process entry point: train and record the outcome on the job."""
+    from src.ml.pipeline import train_model
+    from src.ml.registry import active_version
+
+    job = _read(job_id)
+    update_job(job_id, pid=os.getpid())
+    try:
+        metrics = train_model(dataset_csv=job["dataset_csv"],
+                              progress=lambda stage: update_job(job_id, stage=stage))
+    except Exception as e:
+        update_job(job_id, status="failed", error=str(e), finished_at=time.time())
+        raise
+    update_job(job_id, status="succeeded", stage=None, metrics=metrics,
+               model_version=active_version(), finished_at=time.time())
+
+
+if __name__ == "__main__":
+    _run_job(sys.argv[1])
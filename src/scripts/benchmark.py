@@ -0,0 +1,671 @@
+"""
+Benchmark suite for inference, feature extraction and training.
+
+Inputs come from ``--dataset_csv`` or, by default, a synthetic news corpus
+(see ``synthetic_corpus``) of configurable size and length distribution.
+Results can be written as JSON and compared with an earlier run on the same
+machine:
+
+    python -m src.scripts.benchmark --n 1000 --output bench.json
+    python -m src.scripts.benchmark --train_sizes 1000,4000 --output bench.json
+    python -m src.scripts.benchmark --output new.json --compare old.json
+
+Suites (``--suite``): latency, batch, cache, text, vectorize, cold_start, train.
+``batch`` also times a ``predict`` loop against ``predict_batch`` on the same texts.
+``train`` only runs with ``--train_sizes``; each size trains in a child
+process against a throwaway MODEL_DIR, so the served model is left alone.
+
+``--import_budget SECONDS`` only checks that ``import app`` stays within
+budget without loading training- or fetch-only dependencies, and exits
+non-zero otherwise (for CI).
+
+``--sentiment_parity`` only checks that the lexicon sentiment scorer gives
+TextBlob's scores on a fixed corpus (``sentiment_parity_corpus``), and exits
+non-zero on any difference (for CI).
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# The suites score the same texts repeatedly; measure the model, not the
+# prediction cache (the "cache" suite measures that separately)
+os.environ.setdefault("PREDICT_CACHE_MAX_ENTRIES", "0")
+
+from src.ml import pipeline
+from src.ml.pipeline import LONG_DOC_STRATEGIES, build_features, load_model, load_scorer, predict, predict_batch
+from src.utils.preprocess import clean_text
+from src.utils.sentiment import get_lexicon, sentiment_features_batch
+
+SUITES = ("latency", "batch", "cache", "text", "vectorize", "cold_start", "train")
+# Seconds allowed for ``import app`` (best of 3), and modules it must not load
+IMPORT_BUDGET_S = float(os.environ.get("IMPORT_BUDGET_S", "1.0"))
+SERVING_FORBIDDEN_MODULES = ("sklearn", "pandas", "scipy", "trafilatura", "bs4", "duckduckgo_search",
+                             "nltk", "joblib", "requests")
+
+_FUNCTION_WORDS = (
+    "the of and to in a is that for on was with as by at from it his her their said has have "
+    "were be are not this which but after over about more than its into would could will also"
+).split()
+_NEWS_WORDS = (
+    "government president minister officials report police city state election vote campaign "
+    "senator congress court law company market economy percent million billion people health "
+    "hospital study research scientists war military attack security border trade tax budget "
+    "statement spokesman week monday tuesday thursday friday year country international"
+).split()
+_SENSATIONAL = "shocking unbelievable secret exposed miracle outrageous banned destroy hoax truth".split()
+# Largest polarity/subjectivity difference from TextBlob that --sentiment_parity accepts
+SENTIMENT_PARITY_TOLERANCE = 1e-9
+# Negation, intensifier and averaging corner cases of the pattern analyzer
+_PARITY_CASES = (
+    "", "   ", "the of and", "good", "GOOD", "not good", "not not good", "no good", "never good",
+    "very good", "very very good", "not very good", "very not good", "extremely bad", "not extremely bad",
+    "good bad", "good good good", "very", "not", "not very", "good not", "very unheardofword good",
+    "quickly good", "not quickly good", "very good very bad", "never very very bad indeed",
+    "the movie was not bad at all but the ending was terribly sad",
+    "absolutely wonderful", "hardly good", "really really really great", "great 13th 2nd",
+    "it was n't good", "isn't good", "isn’t good", "don’t like it", "café bien très bon",
+)
+
+
+def synthetic_corpus(n: int, mean_words: int = 400, length_sigma: float = 0.6, fake_ratio: float = 0.5,
+                     vocab_size: int = 20000, seed: int = 0):
+    """``n`` synthetic ``(text, label)`` news articles.
+
+    Lengths in words are lognormal with median ``mean_words`` and shape
+    ``length_sigma`` (0 gives fixed-length articles). Words are drawn
+    Zipf-style from function words, news vocabulary, sentiment-lexicon words
+    and ``vocab_size`` pseudo-words; fake rows (label 1) add sensational words,
+    title case and exclamation marks so the classes are learnable.
+    """
+    rnd = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    lexicon = sorted(w for w in get_lexicon().index if w.isalpha())[::4]
+    pseudo = ["".join(rnd.choice(letters) for _ in range(rnd.randint(3, 10))) for _ in range(vocab_size)]
+    vocab = _FUNCTION_WORDS + _NEWS_WORDS + lexicon + pseudo
+    weights = [1.0 / (i + 1) ** 0.9 for i in range(len(vocab))]
+
+    corpus = []
+    for _ in range(n):
+        label = int(rnd.random() < fake_ratio)
+        n_words = max(5, int(rnd.lognormvariate(np.log(mean_words), length_sigma)))
+        words = rnd.choices(vocab, weights, k=n_words)
+        if label:
+            words += rnd.choices(_SENSATIONAL, k=max(1, n_words // 40))
+            rnd.shuffle(words)
+        text = ". ".join(" ".join(words[i:i + 18]).capitalize() for i in range(0, len(words), 18)) + "."
+        if label and rnd.random() < 0.4:
+            text = text.title().replace(".", "!", 3)
+        corpus.append((text, label))
+    return corpus
+
+
+def write_corpus(path: str, corpus):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text", "label"])
+        writer.writerows(corpus)
+
+
+def load_texts(dataset_csv: str, n: int):
+    df = pd.read_csv(dataset_csv, nrows=n)
+    return df["text"].astype(str).tolist()
+
+
+def _percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)), "mean_ms": float(ms.mean())}
+
+
+def bench_latency(texts):
+    """Single ``predict`` latency percentiles."""
+    for t in texts[:5]:
+        predict(t)
+    times = []
+    for t in texts:
+        start = time.perf_counter()
+        predict(t)
+        times.append(time.perf_counter() - start)
+    return {"n_texts": len(texts), **_percentiles(times)}
+
+
+def bench_batch(texts, batch_sizes=(32, 256)):
+    """``predict_batch`` throughput at several batch sizes."""
+    predict_batch(texts[:2])
+    results = []
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            predict_batch(texts[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        results.append({"batch_size": batch_size, "texts_per_s": len(texts) / elapsed,
+                        "ms_per_item": elapsed / len(texts) * 1000})
+    return results
+
+
+def bench_prediction_cache(texts):
+    """``predict`` latency on a cold in-memory prediction cache, then on a warm one."""
+    from src.utils.cache import TTLCache
+
+    disabled = pipeline._prediction_cache
+    pipeline._prediction_cache = TTLCache(max_entries=len(texts) + 1, ttl=3600)
+    try:
+        predict(texts[0])
+        pipeline._prediction_cache.clear()
+        results = {}
+        for name in ("miss", "hit"):
+            times = []
+            for t in texts:
+                start = time.perf_counter()
+                predict(t)
+                times.append(time.perf_counter() - start)
+            results[name] = _percentiles(times)
+        return results
+    finally:
+        pipeline._prediction_cache = disabled
+
+
+def bench_predict_vs_batch(texts, batch_size: int = 256):
+    """Time ``predict`` in a loop against ``predict_batch`` on the same texts."""
+    load_model()  # keep model loading out of the timings
+    predict(texts[0])
+
+    start = time.perf_counter()
+    for t in texts:
+        predict(t)
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        predict_batch(texts[i:i + batch_size])
+    batch_s = time.perf_counter() - start
+
+    n = len(texts)
+    return {
+        "n_texts": n,
+        "batch_size": batch_size,
+        "loop_ms_per_item": loop_s / n * 1000,
+        "batch_ms_per_item": batch_s / n * 1000,
+        "speedup": loop_s / batch_s if batch_s else float("inf"),
+    }
+
+
+def bench_text(texts):
+    """``clean_text`` and ``sentiment_features`` throughput."""
+    n_bytes = sum(len(t.encode("utf-8")) for t in texts)
+    start = time.perf_counter()
+    cleaned = [clean_text(t) for t in texts]
+    clean_s = time.perf_counter() - start
+
+    get_lexicon()
+    start = time.perf_counter()
+    sentiment_features_batch(cleaned)
+    senti_s = time.perf_counter() - start
+    return {
+        "clean_text": {"texts_per_s": len(texts) / clean_s, "mb_per_s": n_bytes / clean_s / 1e6},
+        "sentiment": {"texts_per_s": len(texts) / senti_s, "mb_per_s": n_bytes / senti_s / 1e6},
+    }
+
+
+def bench_vectorize(texts):
+    """Transform cost (ms/text) of each fitted vectorizer, and of the compiled scorer if present."""
+    cleaned = [clean_text(t) for t in texts]
+    _, vectorizer_word, vectorizer_char = load_model()
+    results = {}
+    for name, vectorizer in (("word", vectorizer_word), ("char", vectorizer_char)):
+        start = time.perf_counter()
+        vectorizer.transform(cleaned)
+        results[f"{name}_ms_per_item"] = (time.perf_counter() - start) / len(texts) * 1000
+    scorer = load_scorer()
+    if scorer is not None:
+        small = np.zeros((len(cleaned), len(scorer.small_coef)))
+        start = time.perf_counter()
+        scorer.decision_function(cleaned, small)
+        results["compiled_scorer_ms_per_item"] = (time.perf_counter() - start) / len(texts) * 1000
+    return results
+
+
+def _run_child(code: str, *args, env=None) -> dict:
+    """Run ``code`` in a fresh interpreter and return the JSON object it writes to $BENCH_RESULT.
+
+    A file rather than stdout: background threads (e.g. app's startup checks)
+    print to stdout at any time, even mid-line.
+    """
+    with tempfile.TemporaryDirectory(prefix="truthguard_bench_") as tmp:
+        result_path = os.path.join(tmp, "result.json")
+        proc = subprocess.run([sys.executable, "-c", code, *args], capture_output=True, text=True,
+                              env={**os.environ, **(env or {}), "BENCH_RESULT": result_path})
+        if proc.returncode != 0:
+            raise RuntimeError(f"benchmark child process failed:\n{proc.stderr[-2000:]}")
+        if not os.path.exists(result_path):
+            raise RuntimeError(f"benchmark child process wrote no result:\n{proc.stdout[-2000:]}")
+        with open(result_path) as f:
+            return json.load(f)
+
+
+_COLD_START = """
+import json, os, time
+t0 = time.perf_counter()
+from src.ml import pipeline
+t1 = time.perf_counter()
+scorer = pipeline.load_scorer()
+t2 = time.perf_counter()
+pipeline.load_model()
+t3 = time.perf_counter()
+with open(os.environ["BENCH_RESULT"], "w") as f:
+    json.dump({"import_s": t1 - t0, "load_scorer_s": t2 - t1, "load_model_s": t3 - t2}, f)
+"""
+
+_IMPORT_APP = """
+import json, os, sys, time
+t0 = time.perf_counter()
+import app
+import_s = time.perf_counter() - t0
+with open(os.environ["BENCH_RESULT"], "w") as f:
+    json.dump({"import_s": import_s, "loaded": [m for m in sys.argv[1:] if m in sys.modules]}, f)
+"""
+
+_TRAIN = """
+import json, os, resource, sys, time
+from src.ml.pipeline import train_model
+start = time.perf_counter()
+metrics = train_model(dataset_csv=sys.argv[1], feature_cache=False)
+wall = time.perf_counter() - start
+rss_kb = max(resource.getrusage(r).ru_maxrss for r in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+with open(os.environ["BENCH_RESULT"], "w") as f:
+    json.dump({"wall_s": wall, "peak_rss_mb": rss_kb / 1024, "metrics": metrics}, f)
+"""
+
+
+def bench_cold_start(repeats: int = 3):
+    """Import, ``load_scorer`` and ``load_model`` times in fresh processes (best of ``repeats``)."""
+    runs = [_run_child(_COLD_START) for _ in range(repeats)]
+    return {key: min(r[key] for r in runs) for key in runs[0]}
+
+
+def check_import_budget(budget_s: float = IMPORT_BUDGET_S, repeats: int = 3):
+    """Time ``import app`` in fresh processes and check it against ``budget_s``.
+
+    Also fails when importing the app pulls in a training- or fetch-only
+    dependency (SERVING_FORBIDDEN_MODULES).
+    """
+    runs = [_run_child(_IMPORT_APP, *SERVING_FORBIDDEN_MODULES) for _ in range(repeats)]
+    import_s = min(r["import_s"] for r in runs)
+    loaded = runs[0]["loaded"]
+    return {"import_s": import_s, "budget_s": budget_s, "heavy_modules_loaded": loaded,
+            "passed": import_s <= budget_s and not loaded}
+
+
+def bench_train(sizes, corpus_kwargs):
+    """``train_model`` wall time and peak RSS per synthetic dataset size."""
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="truthguard_bench_") as tmp:
+            csv_path = os.path.join(tmp, "corpus.csv")
+            write_corpus(csv_path, synthetic_corpus(size, **corpus_kwargs))
+            r = _run_child(_TRAIN, csv_path, env={"MODEL_DIR": os.path.join(tmp, "artifacts"),
+                                                  "FEATURE_STORE_DIR": os.path.join(tmp, "feature_cache")})
+        results.append({"rows": size, "wall_s": r["wall_s"], "peak_rss_mb": r["peak_rss_mb"],
+                        "accuracy": r["metrics"].get("full", {}).get("accuracy")})
+    return results
+
+
+def bench_build_features(texts, jobs=(1, 2, 4)):
+    """Time ``build_features`` at several worker counts and check the outputs match."""
+    results = []
+    reference = None
+    for n_jobs in jobs:
+        start = time.perf_counter()
+        out = build_features(texts, n_jobs=n_jobs)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = out
+        results.append({
+            "n_jobs": n_jobs,
+            "seconds": elapsed,
+            "texts_per_s": len(texts) / elapsed,
+            "identical": out == reference,
+        })
+    return results
+
+
+def sentiment_parity_corpus(n_phrases: int = 4000, n_articles: int = 200, seed: int = 0):
+    """Fixed texts for the TextBlob parity check.
+
+    Hand-written corner cases, every lexicon word alone, negated and
+    intensified, random short phrases dense in negations and modifiers, and
+    synthetic articles. Deterministic for a given ``seed``.
+    """
+    lexicon = get_lexicon()
+    words = sorted(lexicon.index)
+    modifiers = [w for w in words if lexicon.index[w] < lexicon.n_words and lexicon.is_modifier[lexicon.index[w]]]
+    texts = list(_PARITY_CASES)
+    for w in words:
+        texts += [w, f"not {w}", f"very {w}", f"never so {w} news"]
+    rnd = random.Random(seed)
+    pool = ["no", "not", "never", "n't"] * 10 + modifiers * 2 + words + ["quickly", "government", "xyzzy"] * 20
+    for _ in range(n_phrases):
+        texts.append(" ".join(rnd.choices(pool, k=rnd.randint(1, 25))))
+    texts += [text for text, _ in synthetic_corpus(n_articles, mean_words=300, seed=seed)]
+    return texts
+
+
+def check_sentiment_parity(tolerance: float = SENTIMENT_PARITY_TOLERANCE, examples: int = 5):
+    """Score ``sentiment_parity_corpus`` (after ``clean_text``) with the lexicon scorer and TextBlob."""
+    from textblob import TextBlob
+
+    cleaned = [clean_text(t) for t in sentiment_parity_corpus()]
+    fast = get_lexicon().score_batch(cleaned)
+    mismatches = []
+    max_diff = 0.0
+    for text, f in zip(cleaned, fast):
+        s = TextBlob(text).sentiment
+        diff = max(abs(f.polarity - s.polarity), abs(f.subjectivity - s.subjectivity))
+        max_diff = max(max_diff, diff)
+        if diff > tolerance:
+            mismatches.append({"text": text[:200], "lexicon": [f.polarity, f.subjectivity],
+                               "textblob": [s.polarity, s.subjectivity]})
+    return {"n_texts": len(cleaned), "mismatches": len(mismatches), "max_abs_diff": max_diff,
+            "tolerance": tolerance, "examples": mismatches[:examples], "passed": not mismatches}
+
+
+def serve_articles(texts, hosts=("127.0.0.1",), latency_s: float = 0.05, fail_every: int = 10):
+    """Local stand-in for news sites: ``http://<host>:<port>/article/<i>`` serves ``texts[i]`` as HTML.
+
+    Every response takes ``latency_s``; the first request for every
+    ``fail_every``-th article gets a 503 and ``/missing/...`` paths a 404.
+    Returns (base URLs, shutdown function). Uses one server per host, e.g.
+    127.0.0.1, 127.0.0.2, ... (Linux routes all of 127/8 to loopback).
+    """
+    import html
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    failed_once, lock = set(), threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency_s)
+            parts = self.path.strip("/").split("/")
+            status = 404 if parts[0] != "article" or not parts[-1].isdigit() else 200
+            if status == 200:
+                i = int(parts[-1]) % len(texts)
+                with lock:
+                    if fail_every and i % fail_every == 0 and self.path not in failed_once:
+                        failed_once.add(self.path)
+                        status = 503
+            body = b"" if status != 200 else (
+                "<html><body><article>"
+                + "".join(f"<p>{html.escape(p)}</p>" for p in texts[i].split(". "))
+                + "</article></body></html>"
+            ).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    servers = [ThreadingHTTPServer((host, 0), Handler) for host in hosts]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def shutdown():
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    return [f"http://{host}:{server.server_address[1]}" for host, server in zip(hosts, servers)], shutdown
+
+
+def bench_bulk_urls(texts, n_urls: int, n_hosts: int = 4, latency_s: float = 0.05, fail_every: int = 10,
+                    **bulk_kwargs):
+    """Pages/second of ``analyze_urls`` against ``serve_articles`` stand-in sites."""
+    import contextlib
+    import io
+    from src.web.bulk import analyze_urls
+
+    bases, shutdown = serve_articles(texts, [f"127.0.0.{i + 1}" for i in range(n_hosts)], latency_s, fail_every)
+    urls = [f"{bases[i % n_hosts]}/article/{i}" for i in range(n_urls)]
+    stats = {}
+    try:
+        # Fetch logging is per URL; keep it out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = list(analyze_urls(urls, stats=stats, **bulk_kwargs))
+    finally:
+        shutdown()
+    scored = sum("result" in row for row in rows)
+    return {"hosts": n_hosts, "latency_ms": latency_s * 1000, "fail_every": fail_every, **bulk_kwargs,
+            **stats, "scored": scored}
+
+
+def bench_long_docs(dataset_csv: str, budgets, strategies=LONG_DOC_STRATEGIES, batch_size: int = 64):
+    """Accuracy and per-text latency of each long-document strategy on the held-out split.
+
+    Uses the same 80/20 split as ``train_model`` and compares every strategy
+    and character budget with full-text scoring. The served model's final
+    refit has seen every row, so absolute accuracy is optimistic; the change
+    against ``full`` is what matters.
+    """
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(dataset_csv)
+    labels = df["label"].astype(int).to_numpy()
+    _, test_idx = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42, stratify=labels)
+    texts = df["text"].astype(str).to_numpy()[test_idx].tolist()
+    y = labels[test_idx]
+
+    def run(strategy, max_chars):
+        probs, worst = [], 0.0
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            start = time.perf_counter()
+            probs.extend(r["prob_fake"] for r in predict_batch(batch, strategy=strategy, max_chars=max_chars))
+            worst = max(worst, (time.perf_counter() - start) / len(batch))
+        return np.array(probs), worst
+
+    predict_batch(texts[:2])
+    full, full_worst = run("full", None)
+    results = [{"strategy": "full", "max_chars": None, "accuracy": float(((full > 0.5) == y).mean()),
+                "worst_batch_ms_per_text": full_worst * 1000}]
+    for max_chars in budgets:
+        n_long = sum(len(t) > max_chars for t in texts)
+        for strategy in strategies:
+            if strategy == "full":
+                continue
+            probs, worst = run(strategy, max_chars)
+            accuracy = float(((probs > 0.5) == y).mean())
+            results.append({
+                "strategy": strategy, "max_chars": max_chars, "texts_over_budget": n_long,
+                "accuracy": accuracy, "accuracy_change": accuracy - results[0]["accuracy"],
+                "label_agreement_with_full": float(((probs > 0.5) == (full > 0.5)).mean()),
+                "mean_abs_prob_change": float(np.abs(probs - full).mean()),
+                "worst_batch_ms_per_text": worst * 1000,
+            })
+    return results
+
+
+def _flatten(obj, prefix=""):
+    """Yield ``("suite.key...", number)`` for every numeric result."""
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _flatten(v, f"{prefix}{k}.")
+    elif isinstance(obj, list):
+        for item in obj:
+            key = ("{strategy}@{max_chars}".format(**item) if "strategy" in item else
+                   next((item[k] for k in ("batch_size", "rows", "n_jobs") if k in item), None))
+            yield from _flatten(item, f"{prefix}{key}.")
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix[:-1], obj
+
+
+def compare(old: dict, new: dict):
+    """Print every result present in both reports with its relative change."""
+    before = dict(_flatten(old["results"]))
+    for key, value in _flatten(new["results"]):
+        if before.get(key):
+            change = (value - before[key]) / abs(before[key]) * 100
+            print(f"  {key:<45} {before[key]:>10.4g} -> {value:<10.4g} ({change:+.1f}%)")
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TruthGuard inference, features and training")
+    parser.add_argument("--dataset_csv", type=str, default=None,
+                        help="CSV with a 'text' column to draw inputs from (default: synthetic corpus)")
+    parser.add_argument("--n", type=int, default=500, help="Number of texts to benchmark with")
+    parser.add_argument("--mean_words", type=int, default=400, help="Median synthetic article length in words")
+    parser.add_argument("--length_sigma", type=float, default=0.6,
+                        help="Lognormal shape of synthetic article lengths (0 = fixed length)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--suite", type=str, default=",".join(SUITES),
+                        help=f"Comma-separated suites to run ({', '.join(SUITES)})")
+    parser.add_argument("--batch_size", type=int, default=256)
+    parser.add_argument("--train_sizes", type=str, default="",
+                        help="Comma-separated synthetic dataset sizes for the train suite, e.g. 1000,4000")
+    parser.add_argument("--feature_jobs", type=str, default="",
+                        help="Comma-separated worker counts to benchmark build_features with, e.g. 1,2,4")
+    parser.add_argument("--sentiment_parity", action="store_true",
+                        help="Only check the lexicon sentiment scorer against TextBlob on a fixed corpus; "
+                             "exit non-zero on any difference")
+    parser.add_argument("--import_budget", type=float, default=None,
+                        help=f"Only check `import app` against this budget in seconds (default {IMPORT_BUDGET_S}); "
+                             "exits non-zero on failure")
+    parser.add_argument("--long_docs", type=str, default="",
+                        help="Comma-separated character budgets: compare long-document strategies with full-text "
+                             "scoring on the held-out split of --dataset_csv")
+    parser.add_argument("--bulk_urls", type=int, default=0,
+                        help="Fetch and score this many URLs from local stand-in sites (src/web/bulk.py)")
+    parser.add_argument("--bulk_hosts", type=int, default=4)
+    parser.add_argument("--bulk_concurrency", type=int, default=16)
+    parser.add_argument("--bulk_per_domain", type=int, default=4)
+    parser.add_argument("--bulk_interval", type=float, default=0.0,
+                        help="Seconds between requests to one host in the bulk benchmark")
+    parser.add_argument("--output", type=str, default="", help="Write results as JSON to this path")
+    parser.add_argument("--compare", type=str, default="", help="Earlier JSON output to compare against")
+    args = parser.parse_args()
+
+    if args.import_budget is not None:
+        r = check_import_budget(args.import_budget)
+        print(f"import app: {r['import_s']:.2f}s (budget {r['budget_s']:.2f}s)"
+              + (f", loaded {', '.join(r['heavy_modules_loaded'])}" if r["heavy_modules_loaded"] else ""))
+        print("✅ Within budget" if r["passed"] else "❌ Over budget")
+        sys.exit(0 if r["passed"] else 1)
+    if args.sentiment_parity:
+        r = check_sentiment_parity()
+        print(f"Sentiment parity on {r['n_texts']} texts: {r['mismatches']} mismatches, "
+              f"max abs diff {r['max_abs_diff']:.2e} (tolerance {r['tolerance']:.0e})")
+        for example in r["examples"]:
+            print(f"  {example['text']!r}: lexicon {example['lexicon']}, TextBlob {example['textblob']}")
+        print("✅ Matches TextBlob" if r["passed"] else "❌ Differs from TextBlob")
+        sys.exit(0 if r["passed"] else 1)
+
+    corpus_kwargs = {"mean_words": args.mean_words, "length_sigma": args.length_sigma, "seed": args.seed}
+    if args.dataset_csv:
+        texts = load_texts(args.dataset_csv, args.n)
+    else:
+        texts = [text for text, _ in synthetic_corpus(args.n, **corpus_kwargs)]
+    suites = args.suite.split(",")
+    results = {}
+
+    if "cold_start" in suites:
+        r = results["cold_start"] = bench_cold_start()
+        print(f"Cold start: import {r['import_s']:.2f}s, load_scorer {r['load_scorer_s']:.2f}s, "
+              f"load_model {r['load_model_s']:.2f}s")
+        r = results["import_app"] = check_import_budget()
+        print(f"import app: {r['import_s']:.2f}s (budget {r['budget_s']:.2f}s)"
+              f"{'' if r['passed'] else '  OVER BUDGET'}")
+    if "latency" in suites:
+        r = results["latency"] = bench_latency(texts)
+        print(f"predict() on {r['n_texts']} texts: p50 {r['p50_ms']:.2f} ms, p95 {r['p95_ms']:.2f} ms, "
+              f"p99 {r['p99_ms']:.2f} ms")
+    if "batch" in suites:
+        results["batch"] = bench_batch(texts, sorted({32, args.batch_size}))
+        for r in results["batch"]:
+            print(f"predict_batch() size {r['batch_size']}: {r['texts_per_s']:.0f} texts/s")
+        r = results["predict_vs_batch"] = bench_predict_vs_batch(texts, args.batch_size)
+        print(f"predict() loop {r['loop_ms_per_item']:.3f} ms/item vs predict_batch() {r['batch_ms_per_item']:.3f} "
+              f"ms/item ({r['speedup']:.1f}x)")
+    if "cache" in suites:
+        r = results["cache"] = bench_prediction_cache(texts)
+        print(f"predict() with prediction cache: miss p50 {r['miss']['p50_ms']:.2f} ms, "
+              f"hit p50 {r['hit']['p50_ms'] * 1000:.1f} us")
+    if "text" in suites:
+        r = results["text"] = bench_text(texts)
+        print(f"clean_text: {r['clean_text']['texts_per_s']:.0f} texts/s, "
+              f"sentiment_features: {r['sentiment']['texts_per_s']:.0f} texts/s")
+    if "vectorize" in suites:
+        r = results["vectorize"] = bench_vectorize(texts)
+        print("Transform: " + ", ".join(f"{k} {v:.3f}" for k, v in r.items()))
+    if "train" in suites and args.train_sizes:
+        results["train"] = bench_train([int(s) for s in args.train_sizes.split(",")], corpus_kwargs)
+        for r in results["train"]:
+            print(f"train_model() on {r['rows']} rows: {r['wall_s']:.1f}s, peak RSS {r['peak_rss_mb']:.0f} MB")
+
+    if args.feature_jobs:
+        jobs = [int(j) for j in args.feature_jobs.split(",")]
+        results["build_features"] = bench_build_features(texts, jobs)
+        print(f"build_features on {len(texts)} texts")
+        for r in results["build_features"]:
+            print(f"  n_jobs={r['n_jobs']}: {r['seconds']:.2f}s ({r['texts_per_s']:.0f} texts/s)"
+                  f"{'' if r['identical'] else '  OUTPUT DIFFERS FROM n_jobs=' + str(jobs[0])}")
+
+    if args.bulk_urls:
+        r = results["bulk_urls"] = bench_bulk_urls(
+            texts, args.bulk_urls, n_hosts=args.bulk_hosts, concurrency=args.bulk_concurrency,
+            per_domain=args.bulk_per_domain, interval=args.bulk_interval, backoff=0.05,
+        )
+        print(f"Bulk URLs: {r['fetched']}/{r['urls']} pages from {r['hosts']} local hosts, {r['retries']} retries, "
+              f"{r['pages_per_s']:.1f} pages/s")
+
+    if args.long_docs:
+        if not args.dataset_csv:
+            parser.error("--long_docs needs a labelled --dataset_csv")
+        results["long_docs"] = bench_long_docs(args.dataset_csv, [int(b) for b in args.long_docs.split(",")])
+        print("Long-document strategies on the held-out split")
+        for r in results["long_docs"]:
+            print(f"  {r['strategy']:<10} budget {str(r['max_chars']):>6}: accuracy {r['accuracy']:.4f}"
+                  + (f" ({r['accuracy_change']:+.4f}, {r['texts_over_budget']} texts over budget)"
+                     if "accuracy_change" in r else "")
+                  + f", worst {r['worst_batch_ms_per_text']:.2f} ms/text")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print(f"Compared with {args.compare}:")
+            compare(json.load(f), report)
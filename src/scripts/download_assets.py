@@ -1,134 +1,353 @@
 """
 Download ML model artifacts from remote storage.
 This runs automatically on deployment to Vercel/Netlify.
+
+Files download concurrently, resume from a ``.part`` file with an HTTP Range
+request after a dropped connection, are checked against their SHA-256 and
+only then renamed into ``src/ml/artifacts``. Expected hashes come from, in
+order: MODEL_MANIFEST (path or URL), ``manifest.json`` in MODEL_MIRROR_DIR,
+``manifest.json`` next to the models at MODEL_BASE_URL, and finally the
+``X-Linked-Etag``/``X-Linked-Size`` headers Hugging Face sends on the redirect
+to its CDN for every LFS file. A file nothing gives a SHA-256 for is rejected
+unless MODEL_ALLOW_UNVERIFIED=1.
+
+Environment:
+    MODEL_BASE_URL          where to download from (default: the Hugging Face repo)
+    MODEL_MIRROR_DIR        local directory checked first (e.g. a shared volume)
+    MODEL_MANIFEST          manifest.json path or URL overriding the above
+    MODEL_DOWNLOAD_WORKERS  concurrent downloads (default 3)
+    MODEL_ALLOW_UNVERIFIED  1 to accept files without a known SHA-256 (size-checked only)
+
+Write a manifest for a set of model files (upload it next to them):
+    python src/scripts/download_assets.py --write-manifest src/ml/artifacts
 """
+import fcntl
+import hashlib
+import json
 import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import requests
 from pathlib import Path
 
 # Configuration
 HUGGINGFACE_BASE_URL = "https://huggingface.co/zeeshann07/truthguard-models/resolve/main"
+MODEL_BASE_URL = os.environ.get("MODEL_BASE_URL", HUGGINGFACE_BASE_URL).rstrip("/")
+MODEL_MIRROR_DIR = os.environ.get("MODEL_MIRROR_DIR")
+MODEL_MANIFEST = os.environ.get("MODEL_MANIFEST")
+MODEL_DOWNLOAD_WORKERS = int(os.environ.get("MODEL_DOWNLOAD_WORKERS", "3"))
+MODEL_ALLOW_UNVERIFIED = os.environ.get("MODEL_ALLOW_UNVERIFIED", "0") == "1"
+MANIFEST_NAME = "manifest.json"
 # Alternative: Use Google Drive public links
 GOOGLE_DRIVE_BASE = "https://drive.google.com/uc?export=download&id="
 
 # Model file IDs (you'll replace these after uploading)
 MODEL_FILES = {
     "fake_news_model.pkl": {
-        "url": f"{HUGGINGFACE_BASE_URL}/fake_news_model.pkl",
+        "url": f"{MODEL_BASE_URL}/fake_news_model.pkl",
         # "url": f"{GOOGLE_DRIVE_BASE}YOUR_FILE_ID_HERE",  # Alternative
         "size_mb": 50
     },
     "tfidf_word_vectorizer.pkl": {
-        "url": f"{HUGGINGFACE_BASE_URL}/tfidf_word_vectorizer.pkl",
+        "url": f"{MODEL_BASE_URL}/tfidf_word_vectorizer.pkl",
         "size_mb": 20
     },
     "tfidf_char_vectorizer.pkl": {
-        "url": f"{HUGGINGFACE_BASE_URL}/tfidf_char_vectorizer.pkl",
+        "url": f"{MODEL_BASE_URL}/tfidf_char_vectorizer.pkl",
         "size_mb": 15
     }
 }
 
 ARTIFACTS_DIR = Path(__file__).parent.parent / "ml" / "artifacts"
 
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 5
+# (connect, read) timeouts in seconds; the read timeout is per chunk, not per file
+DOWNLOAD_TIMEOUT = (10, 60)
+_SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
 
-def download_file(url: str, destination: Path, chunk_size: int = 8192):
-    """Download a file with progress indication."""
-    print(f"Downloading {destination.name}...")
-    
+
+@contextmanager
+def _download_lock():
+    """Exclusive lock next to the artifacts: gunicorn workers, startup and the
+    first request may all try to download, only one does at a time."""
+    ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(ARTIFACTS_DIR / ".download.lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def sha256_file(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest() -> dict:
+    """``{filename: {"sha256": ..., "size": ...}}`` from the first manifest found, else {}."""
+    candidates = []
+    if MODEL_MANIFEST:
+        candidates.append(MODEL_MANIFEST)
+    if MODEL_MIRROR_DIR:
+        candidates.append(os.path.join(MODEL_MIRROR_DIR, MANIFEST_NAME))
+    candidates.append(f"{MODEL_BASE_URL}/{MANIFEST_NAME}")
+    for source in candidates:
+        try:
+            if source.startswith(("http://", "https://")):
+                resp = requests.get(source, timeout=DOWNLOAD_TIMEOUT)
+                if resp.status_code == 404:
+                    continue
+                resp.raise_for_status()
+                manifest = resp.json()
+            elif os.path.exists(source):
+                with open(source) as f:
+                    manifest = json.load(f)
+            else:
+                continue
+            print(f"📄 Using model manifest {source}")
+            return manifest.get("files", manifest)
+        except Exception as e:
+            print(f"⚠️  Could not read model manifest {source}: {e}")
+    return {}
+
+
+def write_manifest(directory) -> dict:
+    """Hash the model files in ``directory`` and write its manifest.json."""
+    directory = Path(directory)
+    files = {name: {"sha256": sha256_file(directory / name), "size": (directory / name).stat().st_size}
+             for name in MODEL_FILES if (directory / name).exists()}
+    with open(directory / MANIFEST_NAME, "w") as f:
+        json.dump({"files": files}, f, indent=2)
+    return files
+
+
+def _linked_metadata(response):
+    """``(sha256, size)`` Hugging Face reports for an LFS file, each None if absent.
+
+    They are sent on the 302 to the CDN, not on the final response, so the
+    redirect history is searched first.
+    """
+    sha256 = size = None
+    for r in [*response.history, response]:
+        etag = (r.headers.get("X-Linked-Etag") or r.headers.get("ETag") or "").strip('W/"')
+        if sha256 is None and _SHA256_HEX.match(etag):
+            sha256 = etag
+        linked_size = r.headers.get("X-Linked-Size", "")
+        if size is None and linked_size.isdigit():
+            size = int(linked_size)
+    return sha256, size
+
+
+def _remote_metadata(url: str):
+    """``_linked_metadata`` of ``url`` from a HEAD request that does not follow the redirect."""
     try:
-        response = requests.get(url, stream=True, timeout=300)
-        response.raise_for_status()
-        
-        total_size = int(response.headers.get('content-length', 0))
-        downloaded = 0
-        
-        with open(destination, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size > 0:
-                        progress = (downloaded / total_size) * 100
-                        print(f"  Progress: {progress:.1f}%", end='\r')
-        
-        print(f"\n✅ Downloaded {destination.name} ({downloaded / 1024 / 1024:.1f} MB)")
+        return _linked_metadata(requests.head(url, allow_redirects=False, timeout=DOWNLOAD_TIMEOUT))
+    except requests.RequestException as e:
+        print(f"⚠️  Could not read checksum headers for {url}: {e}")
+        return None, None
+
+
+def _finish(partial: Path, destination: Path, sha256=None, size=None) -> bool:
+    """Verify ``partial`` and atomically rename it to ``destination``; delete it if corrupt."""
+    actual_size = partial.stat().st_size
+    if size is not None and actual_size != size:
+        print(f"❌ {destination.name}: expected {size} bytes, got {actual_size}")
+        if actual_size > size:
+            partial.unlink()
+        return False
+    if sha256:
+        actual = sha256_file(partial)
+        if actual != sha256:
+            print(f"❌ {destination.name}: SHA-256 mismatch (expected {sha256[:12]}…, got {actual[:12]}…)")
+            partial.unlink()
+            return False
+    elif MODEL_ALLOW_UNVERIFIED:
+        print(f"⚠️  {destination.name}: no SHA-256 available, size-checked only (MODEL_ALLOW_UNVERIFIED=1)")
+    else:
+        print(f"❌ {destination.name}: no SHA-256 from a manifest or the server, refusing to install it "
+              "(publish a manifest.json or set MODEL_ALLOW_UNVERIFIED=1)")
+        return False
+    os.replace(partial, destination)
+    return True
+
+
+def copy_from_mirror(destination: Path, sha256=None, size=None) -> bool:
+    """Copy ``destination.name`` from MODEL_MIRROR_DIR, if it is there and intact."""
+    source = Path(MODEL_MIRROR_DIR or "") / destination.name
+    if not MODEL_MIRROR_DIR or not source.is_file():
+        return False
+    partial = destination.with_name(destination.name + ".part")
+    shutil.copyfile(source, partial)
+    if _finish(partial, destination, sha256, size):
+        print(f"✅ Copied {destination.name} from mirror {MODEL_MIRROR_DIR}")
         return True
-        
-    except Exception as e:
-        print(f"❌ Failed to download {destination.name}: {str(e)}")
+    return False
+
+
+def download_file(url: str, destination: Path, chunk_size: int = CHUNK_SIZE, sha256=None, size=None,
+                  retries: int = DOWNLOAD_RETRIES):
+    """Download ``url`` to ``destination``, resuming and verifying as described above."""
+    print(f"Downloading {destination.name}...")
+    # Written next to the destination and renamed into place, so a
+    # concurrent loader never sees a half-written file
+    partial = destination.with_name(destination.name + ".part")
+    start = time.perf_counter()
+    fetched = 0
+    if sha256 is None or size is None:
+        linked_sha256, linked_size = _remote_metadata(url)
+        sha256, size = sha256 or linked_sha256, size if size is not None else linked_size
+
+    for attempt in range(1, retries + 1):
+        offset = partial.stat().st_size if partial.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                linked_sha256, linked_size = _linked_metadata(response)
+                sha256, size = sha256 or linked_sha256, size if size is not None else linked_size
+                if response.status_code == 416 and offset:
+                    # Nothing left past our offset: the partial file is complete
+                    break
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    print(f"  {destination.name}: server ignored the Range request, restarting")
+                    offset = 0
+                elif offset:
+                    print(f"  {destination.name}: resuming at {offset / 1024 / 1024:.1f} MB")
+                with open(partial, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        fetched += len(chunk)
+            if size is None or partial.stat().st_size >= size:
+                break
+            print(f"⚠️  {destination.name}: connection closed early (attempt {attempt}/{retries}, resuming)")
+        except (requests.RequestException, OSError) as e:
+            if attempt == retries:
+                print(f"❌ Failed to download {destination.name}: {str(e)}")
+                return False
+            print(f"⚠️  {destination.name}: {e} (attempt {attempt}/{retries}, retrying)")
+            time.sleep(min(2 ** attempt, 30))
+
+    if not _finish(partial, destination, sha256, size):
         return False
+    elapsed = time.perf_counter() - start
+    print(f"✅ Downloaded {destination.name} ({fetched / 1024 / 1024:.1f} MB in {elapsed:.1f}s)")
+    return True
 
 
-def check_model_exists(filename: str) -> bool:
-    """Check if model file already exists."""
+def check_model_exists(filename: str, expected=None, verify_hash: bool = False) -> bool:
+    """Check the model file exists and, given its manifest entry, has the expected size (and hash)."""
     filepath = ARTIFACTS_DIR / filename
-    return filepath.exists() and filepath.stat().st_size > 0
+    if not filepath.exists() or filepath.stat().st_size == 0:
+        return False
+    expected = expected or {}
+    if expected.get("size") is not None and filepath.stat().st_size != expected["size"]:
+        return False
+    if verify_hash and expected.get("sha256"):
+        return sha256_file(filepath) == expected["sha256"]
+    return True
+
 
+def download_models(workers: int = MODEL_DOWNLOAD_WORKERS):
+    """Download all required model files.
 
-def download_models():
-    """Download all required model files."""
+    Whoever waited on the lock re-checks what exists, so files another process
+    just installed are not fetched again."""
+    with _download_lock():
+        return _download_missing(workers)
+
+
+def _fetch_one(filename: str, info: dict, expected: dict) -> bool:
+    destination = ARTIFACTS_DIR / filename
+    sha256, size = expected.get("sha256"), expected.get("size")
+    if copy_from_mirror(destination, sha256, size):
+        return True
+    return download_file(info["url"], destination, sha256=sha256, size=size)
+
+
+def _download_missing(workers: int):
     print("=" * 60)
     print("TruthGuard Model Downloader")
     print("=" * 60)
-    
+
     # Create artifacts directory if it doesn't exist
     ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
     print(f"📁 Artifacts directory: {ARTIFACTS_DIR}")
-    
+    manifest = load_manifest()
+
     # Check which files need downloading
     files_to_download = []
     for filename, info in MODEL_FILES.items():
-        if check_model_exists(filename):
+        if check_model_exists(filename, manifest.get(filename)):
             print(f"✅ {filename} already exists (skipping)")
         else:
             files_to_download.append((filename, info))
-    
+
     if not files_to_download:
         print("\n🎉 All model files are already downloaded!")
         return True
-    
+
     # Download missing files
     print(f"\n📥 Downloading {len(files_to_download)} file(s)...")
-    success_count = 0
-    
-    for filename, info in files_to_download:
-        destination = ARTIFACTS_DIR / filename
-        if download_file(info["url"], destination):
-            success_count += 1
-        else:
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files_to_download)))) as pool:
+        results = list(pool.map(lambda item: _fetch_one(*item, manifest.get(item[0], {})), files_to_download))
+    for (filename, _), ok in zip(files_to_download, results):
+        if not ok:
             print(f"⚠️  Warning: Failed to download {filename}")
-    
+    success_count = sum(results)
+
     print("\n" + "=" * 60)
     print(f"✅ Successfully downloaded {success_count}/{len(files_to_download)} files")
     print("=" * 60)
-    
+
     return success_count == len(files_to_download)
 
 
-def verify_models():
-    """Verify all required models are present."""
+def verify_models(manifest=None):
+    """Verify all required models are present (and match the manifest's hashes, if given)."""
     print("\n🔍 Verifying model files...")
+    manifest = manifest or {}
     all_present = True
-    
+
     for filename in MODEL_FILES.keys():
-        if check_model_exists(filename):
+        if check_model_exists(filename, manifest.get(filename), verify_hash=True):
             filepath = ARTIFACTS_DIR / filename
             size_mb = filepath.stat().st_size / 1024 / 1024
             print(f"  ✅ {filename} ({size_mb:.1f} MB)")
         else:
-            print(f"  ❌ {filename} - MISSING")
+            print(f"  ❌ {filename} - MISSING OR CORRUPT")
             all_present = False
-    
+
     return all_present
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Download TruthGuard model files")
+    parser.add_argument("--write-manifest", metavar="DIR",
+                        help="Write manifest.json for the model files in DIR instead of downloading")
+    parser.add_argument("--workers", type=int, default=MODEL_DOWNLOAD_WORKERS)
+    args = parser.parse_args()
+
+    if args.write_manifest:
+        for name, entry in write_manifest(args.write_manifest).items():
+            print(f"  {name}: {entry['sha256']} ({entry['size']} bytes)")
+        exit(0)
+
     print("\n🚀 Starting model download process...\n")
-    
-    success = download_models()
-    
+
+    success = download_models(args.workers)
+
     if success:
-        verify_models()
+        verify_models(load_manifest())
         print("\n✅ All models ready for deployment!")
     else:
         print("\n⚠️  Some models failed to download. Check the errors above.")
@@ -0,0 +1,299 @@
+"""
+Small TTL + LRU caches shared by the fetch, search and prediction paths.
+
+``TTLCache`` lives in process memory. ``SQLiteCache`` has the same interface
+but stores entries in a sqlite file, so every gunicorn worker on a node reads
+and fills the same cache. Values must be JSON-serialisable. ``TieredCache``
+puts a small ``TTLCache`` in front of a shared one.
+
+``get`` returns a ``CacheEntry`` even when it is past its TTL if
+``allow_stale=True``; callers use that to revalidate (e.g. a conditional GET)
+instead of refetching from scratch.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    meta: Dict = field(default_factory=dict)
+    fresh: bool = True
+
+
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 900.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = _Counters()
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+        return self._count(entry, allow_stale)
+
+    def set(self, key: str, value, meta: Optional[Dict] = None, stored_at: Optional[float] = None):
+        """Store ``value``; ``stored_at`` (default now) is when it was computed, for the TTL."""
+        with self._lock:
+            self._data[key] = CacheEntry(value, time.time() if stored_at is None else stored_at, dict(meta or {}))
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.counters.incr("evictions", evicted)
+
+    def touch(self, key: str):
+        """Mark an entry fresh again, e.g. after a 304 Not Modified."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry.stored_at = time.time()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", "entries": len(self), "max_entries": self.max_entries,
+                "ttl": self.ttl, **self.counters.as_dict()}
+
+    def _count(self, entry: Optional[CacheEntry], allow_stale: bool) -> Optional[CacheEntry]:
+        if entry is None:
+            self.counters.incr("misses")
+            return None
+        fresh = (time.time() - entry.stored_at) <= self.ttl
+        if fresh:
+            self.counters.incr("hits")
+        else:
+            self.counters.incr("stale")
+            if not allow_stale:
+                self.counters.incr("misses")
+                return None
+        return CacheEntry(entry.value, entry.stored_at, dict(entry.meta), fresh)
+
+
+class SQLiteCache(TTLCache):
+    """``TTLCache`` backed by a sqlite file shared between processes.
+
+    LRU order is kept with an ``accessed_at`` column and the row count in a
+    ``meta`` table, so a write only evicts once the file is over the bound;
+    each process keeps its own hit/miss counters.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 900.0):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT, meta TEXT,"
+                " stored_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+            # Row count kept alongside the data: COUNT(*) is a full scan
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('entries', (SELECT COUNT(*) FROM entries))")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after fork (connections must not cross processes)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        entry = None
+        try:
+            with self._conn() as conn:
+                row = conn.execute(
+                    "SELECT value, meta, stored_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                    entry = CacheEntry(json.loads(row[0]), row[2], json.loads(row[1] or "{}"))
+        except sqlite3.Error as e:
+            print(f"Cache read failed ({self.path}): {e}")
+        return self._count(entry, allow_stale)
+
+    def set(self, key: str, value, meta: Optional[Dict] = None, stored_at: Optional[float] = None):
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                row = (json.dumps(value), json.dumps(meta or {}), now if stored_at is None else stored_at, now, key)
+                if conn.execute("UPDATE entries SET value = ?, meta = ?, stored_at = ?, accessed_at = ?"
+                                " WHERE key = ?", row).rowcount:
+                    return
+                conn.execute("INSERT INTO entries (value, meta, stored_at, accessed_at, key) VALUES (?, ?, ?, ?, ?)",
+                             row)
+                conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'entries'")
+                entries = conn.execute("SELECT value FROM meta WHERE name = 'entries'").fetchone()[0]
+                if entries <= self.max_entries:
+                    return
+                evicted = conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                    (entries - self.max_entries,),
+                ).rowcount
+                conn.execute("UPDATE meta SET value = value - ? WHERE name = 'entries'", (evicted,))
+            self.counters.incr("evictions", evicted)
+        except sqlite3.Error as e:
+            print(f"Cache write failed ({self.path}): {e}")
+
+    def touch(self, key: str):
+        try:
+            with self._conn() as conn:
+                conn.execute("UPDATE entries SET stored_at = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"Cache write failed ({self.path}): {e}")
+
+    def delete(self, key: str):
+        try:
+            with self._conn() as conn:
+                if conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount:
+                    conn.execute("UPDATE meta SET value = value - 1 WHERE name = 'entries'")
+        except sqlite3.Error as e:
+            print(f"Cache write failed ({self.path}): {e}")
+
+    def clear(self):
+        try:
+            with self._conn() as conn:
+                conn.execute("DELETE FROM entries")
+                conn.execute("UPDATE meta SET value = 0 WHERE name = 'entries'")
+        except sqlite3.Error as e:
+            print(f"Cache write failed ({self.path}): {e}")
+
+    def __len__(self):
+        return self._conn().execute("SELECT value FROM meta WHERE name = 'entries'").fetchone()[0]
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "backend": "sqlite", "path": self.path}
+
+
+class TieredCache:
+    """An in-process ``TTLCache`` in front of a shared (e.g. sqlite) one.
+
+    Reads try the local tier first and copy shared hits into it; writes go to
+    both. Each tier keeps its own counters; ``counters`` here count a hit in
+    either tier as a hit.
+    """
+
+    def __init__(self, local: TTLCache, shared: TTLCache):
+        self.local = local
+        self.shared = shared
+        self.ttl = shared.ttl
+        self.max_entries = shared.max_entries
+        self.counters = _Counters()
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        entry = self.local.get(key, allow_stale)
+        if entry is None:
+            entry = self.shared.get(key, allow_stale)
+            if entry is not None and entry.fresh:
+                # Keep the shared timestamp: the copy must not outlive the original's TTL
+                self.local.set(key, entry.value, entry.meta, stored_at=entry.stored_at)
+        self.counters.incr("hits" if entry is not None else "misses")
+        return entry
+
+    def set(self, key: str, value, meta: Optional[Dict] = None, stored_at: Optional[float] = None):
+        self.local.set(key, value, meta, stored_at)
+        self.shared.set(key, value, meta, stored_at)
+
+    def touch(self, key: str):
+        self.local.touch(key)
+        self.shared.touch(key)
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def __len__(self):
+        return len(self.shared)
+
+    def stats(self) -> Dict:
+        return {"backend": "tiered", "local": self.local.stats(), "shared": self.shared.stats(),
+                **self.counters.as_dict()}
+
+
+def make_cache(prefix: str, default_ttl: float, default_max_entries: int, default_local_entries: int = 0):
+    """Build a cache configured from ``<PREFIX>_CACHE_*`` environment variables.
+
+    ``<PREFIX>_CACHE_BACKEND`` is ``memory`` (default) or ``sqlite``;
+    ``<PREFIX>_CACHE_PATH`` sets the sqlite file; ``_TTL`` / ``_MAX_ENTRIES``
+    override the defaults. With sqlite and ``_LOCAL_ENTRIES`` > 0 an
+    in-process LRU of that size sits in front of it (``TieredCache``).
+    """
+    ttl = float(os.environ.get(f"{prefix}_CACHE_TTL", default_ttl))
+    max_entries = int(os.environ.get(f"{prefix}_CACHE_MAX_ENTRIES", default_max_entries))
+    backend = os.environ.get(f"{prefix}_CACHE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        import tempfile
+        path = os.environ.get(
+            f"{prefix}_CACHE_PATH",
+            os.path.join(tempfile.gettempdir(), f"truthguard_{prefix.lower()}_cache.sqlite3"),
+        )
+        try:
+            shared = SQLiteCache(path, max_entries=max_entries, ttl=ttl)
+            local_entries = int(os.environ.get(f"{prefix}_CACHE_LOCAL_ENTRIES", default_local_entries))
+            if local_entries > 0:
+                return TieredCache(TTLCache(max_entries=local_entries, ttl=ttl), shared)
+            return shared
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not open sqlite cache at {path}, using in-memory cache: {e}")
+    return TTLCache(max_entries=max_entries, ttl=ttl)
@@ -1,43 +1,146 @@
-import requests
-from bs4 import BeautifulSoup
-import trafilatura
+import os
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from src.utils.cache import make_cache
+from src.utils.metrics import register_cache, time_stage
 
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
 }
 
+# Bodies are streamed and cut off at this many bytes; article text sits well
+# inside the first MB or two of any real page
+MAX_FETCH_BYTES = int(os.environ.get("MAX_FETCH_BYTES", str(2 * 1024 * 1024)))
+FETCH_CHUNK_BYTES = 64 * 1024
+# (connect, read) timeouts in seconds
+FETCH_TIMEOUT = (5, 10)
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+# Connection pool: number of hosts kept alive and connections per host
+FETCH_POOL_HOSTS = int(os.environ.get("FETCH_POOL_HOSTS", "32"))
+FETCH_POOL_SIZE = int(os.environ.get("FETCH_POOL_SIZE", "8"))
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "ref_src", "ref_url", "cmpid", "ocid", "smid", "spm",
+}
+
+# Extracted article text keyed by normalized URL. Configure with FETCH_CACHE_TTL,
+# FETCH_CACHE_MAX_ENTRIES, FETCH_CACHE_BACKEND=sqlite and FETCH_CACHE_PATH.
+_text_cache = make_cache("FETCH", default_ttl=900, default_max_entries=1024)
+register_cache("article_text", _text_cache)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical cache key for a URL: lowercase scheme/host, no default port,
+    no fragment, tracking parameters removed and the rest sorted."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def cache_stats() -> dict:
+    return _text_cache.stats()
+
+
+class NotHTMLError(ValueError):
+    """The URL answered with a content type we cannot extract article text from."""
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """Process-wide ``requests.Session`` with per-host keep-alive pools.
+
+    Recreated after fork so workers never share sockets with the master.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            # Imported on first fetch so text-only serving never loads them
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_POOL_HOSTS, pool_maxsize=FETCH_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def _download(url: str, validators: dict):
+    """GET ``url``, conditionally if we hold ETag/Last-Modified validators.
+
+    The body is streamed over the shared session and cut off at
+    MAX_FETCH_BYTES; non-HTML responses are abandoned before the body is read.
+    Returns (status_code, body_bytes, validators_from_response).
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    with get_session().get(url, headers=headers, timeout=FETCH_TIMEOUT, stream=True) as resp:
+        print(f"HTTP Status: {resp.status_code}")
+        if resp.status_code == 304:
+            return 304, b"", validators
+        resp.raise_for_status()
+
+        content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            raise NotHTMLError(f"Unsupported content type: {content_type}")
+
+        chunks, size = [], 0
+        for chunk in resp.iter_content(chunk_size=FETCH_CHUNK_BYTES):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= MAX_FETCH_BYTES:
+                print(f"Body exceeds {MAX_FETCH_BYTES} bytes, truncating")
+                break
+        body = b"".join(chunks)[:MAX_FETCH_BYTES]
+
+        new_validators = {}
+        if resp.headers.get("ETag"):
+            new_validators["etag"] = resp.headers["ETag"]
+        if resp.headers.get("Last-Modified"):
+            new_validators["last_modified"] = resp.headers["Last-Modified"]
+        return resp.status_code, body, new_validators
+
+
+def _extract_from_html(html) -> str:
+    """Main text of a downloaded page: trafilatura first, BeautifulSoup as fallback."""
+    import trafilatura
+    from bs4 import BeautifulSoup
 
-def extract_article_text(url: str) -> str:
-    """Extract main text content from a news article URL using trafilatura with HTML fallback."""
-    if not url:
-        print("ERROR: No URL provided")
-        return ""
-    
-    print(f"Attempting to extract text from: {url}")
-    text = ""
-    
-    # Try trafilatura first
     try:
         print("Trying trafilatura extraction...")
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            text = trafilatura.extract(downloaded, include_comments=False, include_tables=False) or ""
-            if text:
-                print(f"Trafilatura success: extracted {len(text)} characters")
-                return text.strip()
+        text = trafilatura.extract(html, include_comments=False, include_tables=False) or ""
+        if text:
+            print(f"Trafilatura success: extracted {len(text)} characters")
+            return text.strip()
         print("Trafilatura returned no content")
     except Exception as e:
         print(f"Trafilatura failed: {str(e)}")
 
-    # Fallback to requests + BeautifulSoup
     try:
         print("Trying BeautifulSoup fallback...")
-        resp = requests.get(url, headers=DEFAULT_HEADERS, timeout=10)
-        resp.raise_for_status()
-        print(f"HTTP Status: {resp.status_code}")
-        
-        soup = BeautifulSoup(resp.text, "html.parser")
-        
+        soup = BeautifulSoup(html, "html.parser")
+
         # Try common article containers
         selectors = ["article", "div.story-body", "div#content", "main"]
         chunks = []
@@ -47,7 +150,7 @@ def extract_article_text(url: str) -> str:
                     txt = p.get_text(separator=" ", strip=True)
                     if txt:
                         chunks.append(txt)
-        
+
         if not chunks:
             # Fallback: all paragraphs
             print("Using fallback: extracting all paragraphs")
@@ -55,7 +158,7 @@ def extract_article_text(url: str) -> str:
                 txt = p.get_text(separator=" ", strip=True)
                 if txt:
                     chunks.append(txt)
-        
+
         text = "\n".join(chunks)
         if text:
             print(f"BeautifulSoup success: extracted {len(text)} characters")
@@ -64,4 +167,49 @@ def extract_article_text(url: str) -> str:
         return text.strip()
     except Exception as e:
         print(f"BeautifulSoup failed: {str(e)}")
-        return ""
\ No newline at end of file
+        return ""
+
+
+def extract_article_text(url: str, raise_errors: bool = False) -> str:
+    """Extract main text content from a news article URL using trafilatura with HTML fallback.
+
+    Results are cached by normalized URL. Entries past their TTL are revalidated
+    with a conditional GET; a 304 keeps the cached text without re-parsing.
+    A failed download returns "" (or with ``raise_errors`` re-raises, so the
+    caller can decide whether to retry) unless there is stale text to serve.
+    """
+    if not url:
+        print("ERROR: No URL provided")
+        return ""
+
+    key = normalize_url(url)
+    entry = _text_cache.get(key, allow_stale=True)
+    if entry is not None and entry.fresh:
+        print(f"Cache hit for: {url}")
+        return entry.value
+
+    print(f"Attempting to extract text from: {url}")
+    validators = entry.meta if entry is not None else {}
+    try:
+        with time_stage("fetch"):
+            status, html, validators = _download(url, validators)
+    except Exception as e:
+        print(f"Download failed: {str(e)}")
+        if entry is not None:
+            print("Serving stale cached text")
+            return entry.value
+        if raise_errors:
+            raise
+        return ""
+
+    if status == 304 and entry is not None:
+        print("Not modified, revalidated cached text")
+        _text_cache.touch(key)
+        _text_cache.counters.incr("revalidated")
+        return entry.value
+
+    with time_stage("extract"):
+        text = _extract_from_html(html)
+    if text:
+        _text_cache.set(key, text, validators)
+    return text
@@ -0,0 +1,140 @@
+"""
+In-process metrics exposed on ``/metrics`` in the Prometheus text format.
+
+Recording is a dict lookup, a bisect and a few additions under a per-metric
+lock, so it can sit on the hot path. Cache hit ratios are not recorded at
+all: registered caches are read when ``/metrics`` is scraped.
+
+Metrics are per process; with several gunicorn workers each scrape sees the
+worker that answered it, which Prometheus aggregates like any other target.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# Seconds; covers sub-millisecond stages up to slow fetches/searches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts (+Inf last), sum
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = _labels(self.labelnames + ("le",), labels + (bound,))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+STAGE_SECONDS = Histogram(
+    "truthguard_stage_seconds",
+    "Time spent per analysis stage (fetch, extract, clean, sentiment, style, vectorize, predict_proba, "
+    "compiled_score, corroborate)",
+    ("stage",),
+)
+REQUEST_SECONDS = Histogram("truthguard_request_seconds", "Request latency by endpoint", ("endpoint",))
+IN_FLIGHT = Gauge("truthguard_requests_in_flight", "Requests currently being handled", ("endpoint",))
+MODEL_LOAD_SECONDS = Histogram(
+    "truthguard_model_load_seconds", "Time to load a model version", ("kind",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+_metrics = [STAGE_SECONDS, REQUEST_SECONDS, IN_FLIGHT, MODEL_LOAD_SECONDS]
+_caches = {}
+
+
+def time_stage(stage: str):
+    """``with time_stage("fetch"): ...`` records the block in truthguard_stage_seconds."""
+    return STAGE_SECONDS.time(stage)
+
+
+def register_cache(name: str, cache):
+    """Expose a ``TTLCache``'s counters (read at scrape time) under ``cache="name"``."""
+    _caches[name] = cache
+
+
+def _render_caches():
+    stats = {name: cache.counters.as_dict() for name, cache in sorted(_caches.items())}
+    for key, kind, help in (
+        ("hits", "counter", "Cache lookups answered from the cache"),
+        ("misses", "counter", "Cache lookups that missed"),
+        ("evictions", "counter", "Entries evicted to stay under the size limit"),
+        ("hit_ratio", "gauge", "hits / (hits + misses) since process start"),
+    ):
+        name = f"truthguard_cache_{key}" + ("_total" if kind == "counter" else "")
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} {kind}"
+        for cache, values in stats.items():
+            yield f'{name}{{cache="{cache}"}} {values[key]}'
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = [line for metric in _metrics for line in metric.render()]
+    lines.extend(_render_caches())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,257 @@
+"""
+Near-duplicate index: reuse the verdict of an article we already analyzed when
+the same story comes back re-hosted with small edits.
+
+Each cleaned text is reduced to a MinHash signature over its word shingles
+(NEAR_DUP_PERMUTATIONS 32-bit minimums), whose agreement rate estimates the
+Jaccard similarity of two texts. Signatures are split into NEAR_DUP_BANDS bands
+and every band is hashed into an indexed sqlite column (locality-sensitive
+hashing), so a lookup is a handful of index probes that return only texts
+sharing at least one band; those candidates are then checked against
+NEAR_DUP_THRESHOLD. Cost grows with the number of candidates, not the size of
+the index.
+
+The index lives in a sqlite file (NEAR_DUP_PATH) shared by every worker on the
+host, keeps at most NEAR_DUP_MAX_ENTRIES texts (least recently used evicted
+first) and ignores entries stored by another model. Entries older than
+NEAR_DUP_TTL seconds are never matched and are deleted by later writes.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.utils.cache import _Counters
+
+NEAR_DUP_INDEX = os.environ.get("NEAR_DUP_INDEX", "1") == "1"
+NEAR_DUP_PATH = os.environ.get("NEAR_DUP_PATH", os.path.join(tempfile.gettempdir(), "truthguard_near_dup.sqlite3"))
+# Estimated Jaccard similarity of word shingles above which two texts are the same story
+NEAR_DUP_THRESHOLD = float(os.environ.get("NEAR_DUP_THRESHOLD", "0.85"))
+NEAR_DUP_MAX_ENTRIES = int(os.environ.get("NEAR_DUP_MAX_ENTRIES", "1000000"))
+NEAR_DUP_TTL = float(os.environ.get("NEAR_DUP_TTL", str(24 * 3600)))
+# 128 permutations in 16 bands of 8 rows: texts at 0.85 similarity share a band
+# with probability ~0.99, texts at 0.5 with probability ~0.06
+NEAR_DUP_PERMUTATIONS = int(os.environ.get("NEAR_DUP_PERMUTATIONS", "128"))
+NEAR_DUP_BANDS = int(os.environ.get("NEAR_DUP_BANDS", "16"))
+SHINGLE_WORDS = 4
+# Texts shorter than this are too short to call near-duplicates
+MIN_WORDS = 30
+# Candidates checked per lookup, most shared bands first
+MAX_CANDIDATES = 32
+# Expired entries deleted per write, so a backlog is cleared without a slow write
+EXPIRE_BATCH = 256
+_SHINGLE_BLOCK = 4096
+_SEED = 20240901
+
+
+class MinHasher:
+    """MinHash signatures of word shingles, computed with NumPy.
+
+    Shingle hashes are permuted with ``(a * x + b) mod 2**64`` for random odd
+    ``a`` and the top 32 bits kept (multiply-shift hashing). The parameters
+    come from a fixed seed, so every process computes the same signatures.
+    """
+
+    def __init__(self, permutations: int = NEAR_DUP_PERMUTATIONS, bands: int = NEAR_DUP_BANDS,
+                 shingle_words: int = SHINGLE_WORDS):
+        if permutations % bands:
+            raise ValueError(f"{permutations} permutations do not split into {bands} bands")
+        rng = np.random.default_rng(_SEED)
+        self.permutations = permutations
+        self.bands = bands
+        self.rows = permutations // bands
+        self.shingle_words = shingle_words
+        self._a = rng.integers(1, 2 ** 63, permutations, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, permutations, dtype=np.uint64)
+        self._mix = rng.integers(1, 2 ** 63, shingle_words, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._band_mix = rng.integers(1, 2 ** 63, self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+    def shingles(self, words) -> np.ndarray:
+        tokens = np.array([zlib.crc32(w.encode("utf-8")) for w in words], dtype=np.uint64)
+        k = min(self.shingle_words, len(tokens))
+        n = len(tokens) - k + 1
+        out = np.zeros(max(n, 0), dtype=np.uint64)
+        for i in range(k):
+            out += tokens[i:i + n] * self._mix[i]
+        return np.unique(out)
+
+    def signature(self, cleaned: str) -> Optional[np.ndarray]:
+        """MinHash signature of a ``clean_text`` output, or None if it is too short."""
+        words = cleaned.split()
+        if len(words) < MIN_WORDS:
+            return None
+        shingles = self.shingles(words)
+        sig = np.full(self.permutations, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(shingles), _SHINGLE_BLOCK):
+            block = shingles[start:start + _SHINGLE_BLOCK, None] * self._a + self._b
+            np.minimum(sig, block.min(axis=0), out=sig)
+        return (sig >> np.uint64(32)).astype(np.uint32)
+
+    def band_keys(self, sig: np.ndarray) -> list:
+        """One signed 64-bit key per band (sqlite INTEGER)."""
+        rows = sig.reshape(self.bands, self.rows).astype(np.uint64)
+        keys = (rows * self._band_mix).sum(axis=1) + np.arange(self.bands, dtype=np.uint64)
+        return keys.view(np.int64).tolist()
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+
+class NearDuplicateIndex:
+    """Bounded, persistent LSH index from MinHash signatures to stored JSON values."""
+
+    def __init__(self, path: str = NEAR_DUP_PATH, threshold: float = NEAR_DUP_THRESHOLD,
+                 max_entries: int = NEAR_DUP_MAX_ENTRIES, ttl: float = NEAR_DUP_TTL, hasher: MinHasher = None):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hasher = hasher or MinHasher()
+        self.counters = _Counters()
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                " id INTEGER PRIMARY KEY, signature BLOB, value TEXT, model_version TEXT,"
+                " stored_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS docs_accessed ON docs(accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS docs_stored ON docs(stored_at)")
+            # Clustered on (key, doc_id): the table is its own index
+            conn.execute("CREATE TABLE IF NOT EXISTS bands (key INTEGER, doc_id INTEGER,"
+                         " PRIMARY KEY (key, doc_id)) WITHOUT ROWID")
+            # Row count kept alongside the data: COUNT(*) is a full scan
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('entries', (SELECT COUNT(*) FROM docs))")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after fork (connections must not cross processes)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def signature(self, cleaned: str) -> Optional[np.ndarray]:
+        """Signature to ``lookup``/``add`` a ``clean_text`` output with (None if too short)."""
+        return self.hasher.signature(cleaned)
+
+    def lookup(self, sig: np.ndarray, model_version: str = "") -> Optional[Dict]:
+        """The stored value of the most similar indexed text at or above the threshold.
+
+        Returns ``{"value", "similarity", "stored_at"}`` or None.
+        """
+        keys = self.hasher.band_keys(sig)
+        best = None
+        try:
+            with self._conn() as conn:
+                # Model and TTL filtered before the LIMIT: stale texts must not crowd out live ones
+                rows = conn.execute(
+                    "SELECT d.id, d.signature, d.value, d.stored_at, COUNT(*) AS shared"
+                    f" FROM bands b JOIN docs d ON d.id = b.doc_id WHERE b.key IN ({','.join('?' * len(keys))})"
+                    " AND d.model_version = ? AND d.stored_at >= ?"
+                    " GROUP BY d.id ORDER BY shared DESC LIMIT ?",
+                    (*keys, model_version or "", time.time() - self.ttl, MAX_CANDIDATES),
+                ).fetchall()
+                for doc_id, blob, value, stored_at, _ in rows:
+                    similarity = self.hasher.similarity(sig, np.frombuffer(blob, dtype=np.uint32))
+                    if similarity >= self.threshold and (best is None or similarity > best[1]):
+                        best = (doc_id, similarity, value, stored_at)
+                if best is not None:
+                    conn.execute("UPDATE docs SET accessed_at = ? WHERE id = ?", (time.time(), best[0]))
+        except sqlite3.Error as e:
+            print(f"Near-duplicate lookup failed ({self.path}): {e}")
+            best = None
+        if best is None:
+            self.counters.incr("misses")
+            return None
+        self.counters.incr("hits")
+        return {"value": json.loads(best[2]), "similarity": best[1], "stored_at": best[3]}
+
+    def add(self, sig: np.ndarray, value, model_version: str = ""):
+        """Index a signature with a JSON-serialisable ``value``.
+
+        Also deletes up to EXPIRE_BATCH expired entries, then evicts the least
+        recently used past the bound.
+        """
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                doc_id = conn.execute(
+                    "INSERT INTO docs (signature, value, model_version, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (sig.tobytes(), json.dumps(value), model_version or "", now, now),
+                ).lastrowid
+                conn.executemany("INSERT INTO bands (key, doc_id) VALUES (?, ?)",
+                                 [(key, doc_id) for key in self.hasher.band_keys(sig)])
+                conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'entries'")
+                expired = conn.execute("SELECT id, signature FROM docs WHERE stored_at < ? LIMIT ?",
+                                       (now - self.ttl, EXPIRE_BATCH)).fetchall()
+                if expired:
+                    self._delete(conn, expired)
+                    self.counters.incr("evictions", len(expired))
+                entries = conn.execute("SELECT value FROM meta WHERE name = 'entries'").fetchone()[0]
+                if entries > self.max_entries:
+                    self._evict(conn, entries - self.max_entries)
+        except sqlite3.Error as e:
+            print(f"Near-duplicate index write failed ({self.path}): {e}")
+
+    def _evict(self, conn: sqlite3.Connection, n: int):
+        victims = conn.execute("SELECT id, signature FROM docs ORDER BY accessed_at LIMIT ?", (n,)).fetchall()
+        self._delete(conn, victims)
+        self.counters.incr("evictions", len(victims))
+
+    def _delete(self, conn: sqlite3.Connection, victims):
+        """Delete ``(id, signature)`` rows and their bands."""
+        # Band rows are found again from the signature, by primary key
+        conn.executemany("DELETE FROM bands WHERE key = ? AND doc_id = ?", [
+            (key, doc_id) for doc_id, blob in victims
+            for key in self.hasher.band_keys(np.frombuffer(blob, dtype=np.uint32))
+        ])
+        conn.executemany("DELETE FROM docs WHERE id = ?", [(doc_id,) for doc_id, _ in victims])
+        conn.execute("UPDATE meta SET value = value - ? WHERE name = 'entries'", (len(victims),))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM bands")
+            conn.execute("DELETE FROM docs")
+            conn.execute("UPDATE meta SET value = 0 WHERE name = 'entries'")
+
+    def __len__(self):
+        return self._conn().execute("SELECT value FROM meta WHERE name = 'entries'").fetchone()[0]
+
+    def stats(self) -> Dict:
+        return {"backend": "sqlite", "path": self.path, "entries": len(self), "max_entries": self.max_entries,
+                "ttl": self.ttl, "threshold": self.threshold, **self.counters.as_dict()}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[NearDuplicateIndex]:
+    """The process-wide index, or None when disabled (NEAR_DUP_INDEX=0) or unavailable."""
+    global _index
+    if not NEAR_DUP_INDEX:
+        return None
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = NearDuplicateIndex()
+            except sqlite3.Error as e:
+                print(f"⚠️  Could not open near-duplicate index at {NEAR_DUP_PATH}, disabling it: {e}")
+                return None
+            from src.utils.metrics import register_cache
+            register_cache("near_duplicate", _index)
+        return _index
@@ -2,16 +2,9 @@ import re
 import string
 from typing import List
 
-import nltk
-from nltk.corpus import stopwords
-
-# Ensure stopwords are available at runtime
-try:
-    _ = stopwords.words('english')
-except LookupError:
-    nltk.download('stopwords')
-
 PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+ASCII_LETTERS = string.ascii_letters.encode('ascii')
+ASCII_UPPER = string.ascii_uppercase.encode('ascii')
 
 URL_REGEX = re.compile(r"https?://\S+|www\.\S+")
 MULTISPACE_REGEX = re.compile(r"\s+")
@@ -28,9 +21,48 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
+def style_features(text: str):
+    """Exclamation, uppercase and punctuation ratios computed on RAW text."""
+    if not text:
+        return (0.0, 0.0, 0.0)
+    total = max(len(text), 1)
+    exclam = text.count('!') / total
+    # Count by deleting characters with translate() so the scans run in C;
+    # non-ASCII text falls back to per-character checks
+    if text.isascii():
+        raw = text.encode('ascii')
+        letters = len(raw) - len(raw.translate(None, ASCII_LETTERS))
+        n_upper = len(raw) - len(raw.translate(None, ASCII_UPPER))
+    else:
+        letters = sum(1 for c in text if c.isalpha())
+        n_upper = sum(1 for c in text if c.isupper())
+    upper = (n_upper / max(letters, 1)) if letters else 0.0
+    punct = (len(text) - len(text.translate(PUNCT_TABLE))) / total
+    return (exclam, upper, punct)
+
+
+_stopwords = None
+
+
+def get_stopwords() -> frozenset:
+    """NLTK's English stopwords, loaded (and downloaded if missing) on first use."""
+    global _stopwords
+    if _stopwords is None:
+        import nltk
+        from nltk.corpus import stopwords
+
+        try:
+            words = stopwords.words('english')
+        except LookupError:
+            nltk.download('stopwords')
+            words = stopwords.words('english')
+        _stopwords = frozenset(words)
+    return _stopwords
+
+
 def tokenize(text: str) -> List[str]:
     if not text:
         return []
     tokens = text.split()
-    stops = set(stopwords.words('english'))
+    stops = get_stopwords()
     return [t for t in tokens if t not in stops and t.isalpha() and len(t) > 2]
\ No newline at end of file
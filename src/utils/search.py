@@ -1,24 +1,102 @@
-from duckduckgo_search import DDGS
+import re
+import threading
+from concurrent.futures import Future
 from typing import List, Dict
 
+from src.utils.cache import make_cache
+from src.utils.fetch import normalize_url
+from src.utils.metrics import register_cache, time_stage
 
-def web_corroborate(query: str, max_results: int = 5) -> List[Dict]:
+# Search results keyed by normalized query. Configure with SEARCH_CACHE_TTL,
+# SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_BACKEND=sqlite and SEARCH_CACHE_PATH.
+_search_cache = make_cache("SEARCH", default_ttl=3600, default_max_entries=2048)
+register_cache("corroboration", _search_cache)
+
+# Searches currently running, so identical concurrent queries share one call
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+
+# One DDGS client per thread (and timeout), reused across calls
+_clients = threading.local()
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    query = query.strip()
+    if query.startswith(("http://", "https://")):
+        return normalize_url(query)
+    return _WHITESPACE.sub(" ", query).lower()
+
+
+def cache_stats() -> dict:
+    return _search_cache.stats()
+
+
+def _client(timeout: int) -> "DDGS":
+    from duckduckgo_search import DDGS
+
+    clients = getattr(_clients, "by_timeout", None)
+    if clients is None:
+        clients = _clients.by_timeout = {}
+    if timeout not in clients:
+        clients[timeout] = DDGS(timeout=timeout)
+    return clients[timeout]
+
+
+def _search(query: str, max_results: int, timeout: int) -> List[Dict]:
+    try:
+        results = list(_client(timeout).text(query, max_results=max_results))
+    except Exception:
+        # Drop the client so a broken session is not reused
+        getattr(_clients, "by_timeout", {}).pop(timeout, None)
+        raise
+    # Normalize
+    output = []
+    for r in results:
+        output.append({
+            "title": r.get("title"),
+            "link": r.get("href") or r.get("url"),
+            "snippet": r.get("body"),
+        })
+    return output
+
+
+def web_corroborate(query: str, max_results: int = 5, timeout: int = 10) -> List[Dict]:
     """Search the web for corroborating sources using DuckDuckGo.
     Returns a list of results with title and link.
+
+    Results are cached by normalized query, and concurrent calls for the same
+    query wait on the one search already in flight instead of issuing another.
     """
     if not query:
         return []
+    key = f"{max_results}:{normalize_query(query)}"
+    entry = _search_cache.get(key)
+    if entry is not None:
+        return entry.value
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+
+    if not owner:
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return []
+
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=max_results))
-        # Normalize
-        output = []
-        for r in results:
-            output.append({
-                "title": r.get("title"),
-                "link": r.get("href") or r.get("url"),
-                "snippet": r.get("body"),
-            })
+        with time_stage("corroborate"):
+            output = _search(query, max_results, timeout)
+        _search_cache.set(key, output)
+        future.set_result(output)
         return output
-    except Exception:
-        return []
\ No newline at end of file
+    except Exception as e:
+        future.set_exception(e)
+        return []
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
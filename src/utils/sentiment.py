@@ -1,5 +1,47 @@
-from textblob import TextBlob
+"""
+Sentiment features (polarity/subjectivity).
+
+``sentiment_features`` used to build a ``TextBlob`` per document. It now uses
+``SentimentLexicon``, which loads TextBlob's English pattern lexicon
+(``en-sentiment.xml``) once into flat arrays and re-implements the pattern
+analyzer's scoring (intensifiers, negation, averaging) on integer codes:
+
+* tokens of a whole batch are mapped to lexicon codes in one C-level pass
+* tokens that cannot change the analyzer's state are dropped with NumPy masks
+* only the remaining handful of tokens per document go through the
+  negation/modifier state machine
+
+Scores match TextBlob on text produced by ``clean_text`` (no ASCII
+punctuation); raw text with "!" boosts or contractions is approximated.
+Set ``SENTIMENT_ENGINE=textblob`` to use TextBlob itself.
+"""
+import importlib.util
+import os
+import xml.etree.ElementTree as ET
 from dataclasses import dataclass
+from itertools import repeat
+
+import numpy as np
+
+SENTIMENT_ENGINE = os.environ.get("SENTIMENT_ENGINE", "lexicon")
+
+NEGATIONS = ("no", "not", "n't", "never")
+# Pattern's emoticon table: (mood, polarity) -> forms
+EMOTICONS = {
+    ("love", +1.00): ("<3", "♥"),
+    ("grin", +1.00): (">:D", ":-D", ":D", "=-D", "=D", "X-D", "x-D", "XD", "xD", "8-D"),
+    ("taunt", +0.75): (">:P", ":-P", ":P", ":-p", ":p", ":-b", ":b", ":c)", ":o)", ":^)"),
+    ("smile", +0.50): (">:)", ":-)", ":)", "=)", "=]", ":]", ":}", ":>", ":3", "8)", "8-)"),
+    ("wink", +0.25): (">;]", ";-)", ";)", ";-]", ";]", ";D", ";^)", "*-)", "*)"),
+    ("gasp", +0.05): (">:o", ":-O", ":O", ":o", ":-o", "o_O", "o.O", "°O°", "°o°"),
+    ("worry", -0.25): (">:/", ":-/", ":/", ":\\", ">:\\", ":-.", ":-s", ":s", ":S", ":-S", ">.>"),
+    ("frown", -0.75): (">:[", ":-(", ":(", "=(", ":-[", ":[", ":{", ":-<", ":c", ":-c", "=/"),
+    ("cry", -1.00): (":'(", ":'''(", ";'("),
+}
+_PATTERN_PUNCTUATION = ".,;:!?()[]{}`''\"@#$^&*+-|=~_"
+# Pattern's tokenizer splits these off as separate tokens
+_QUOTES = str.maketrans({"“": " “ ", "”": " ” ", "‘": " ‘ ", "’": " ’ ", "'": " ' ", '"': ' " '})
+
 
 @dataclass
 class SentimentResult:
@@ -7,9 +49,174 @@ class SentimentResult:
     subjectivity: float
 
 
+def _default_lexicon_path() -> str:
+    # Locate TextBlob's data file without importing textblob (which imports nltk)
+    spec = importlib.util.find_spec("textblob")
+    if spec is None or not spec.submodule_search_locations:
+        raise FileNotFoundError("textblob is not installed; its en-sentiment.xml lexicon is required")
+    return os.path.join(list(spec.submodule_search_locations)[0], "en", "en-sentiment.xml")
+
+
+def _avg(values):
+    return sum(values) / float(len(values) or 1)
+
+
+def _load_pattern_lexicon(path: str) -> dict:
+    """Same averaging as pattern's ``Sentiment.load`` plus TextBlob's English
+    adjective -> "-ly" adverb expansion. Returns {word: {pos: (p, s, i)}}."""
+    words = {}
+    for w in ET.parse(path).getroot().findall("word"):
+        form = w.attrib.get("form")
+        if form:
+            psi = (float(w.attrib.get("polarity", 0.0)),
+                   float(w.attrib.get("subjectivity", 0.0)),
+                   float(w.attrib.get("intensity", 1.0)))
+            words.setdefault(form, {}).setdefault(w.attrib.get("pos"), []).append(psi)
+    for w in words:
+        words[w] = dict((pos, [_avg(each) for each in zip(*psi)]) for pos, psi in words[w].items())
+    for w, pos in list(words.items()):
+        words[w][None] = [_avg(each) for each in zip(*pos.values())]
+    # Map "terrible" to adverb "terribly"
+    for w, pos in list(words.items()):
+        if "JJ" in pos:
+            if w.endswith("y"):
+                w = w[:-1] + "i"
+            if w.endswith("le"):
+                w = w[:-2]
+            entry = words.setdefault(w + "ly", {})
+            entry["RB"] = entry[None] = tuple(pos["JJ"])
+    return words
+
+
+class SentimentLexicon:
+    """The pattern sentiment lexicon as arrays indexed by integer word codes."""
+
+    def __init__(self, path: str = None):
+        words = _load_pattern_lexicon(path or _default_lexicon_path())
+        vocab = list(words)
+        self.index = {w: i for i, w in enumerate(vocab)}
+        psi = np.array([words[w][None] for w in vocab], dtype=np.float64).reshape(-1, 3)
+        self.polarity = psi[:, 0].tolist()
+        self.subjectivity = psi[:, 1].tolist()
+        self.intensity = psi[:, 2].tolist()
+        self.is_modifier = ["RB" in words[w] for w in vocab]
+        self.ends_ly = [w.endswith("ly") for w in vocab]
+        self.is_negation = [w in NEGATIONS for w in vocab]
+        self.n_words = len(vocab)
+
+        # Codes past the vocabulary: emoticons, unknown negations, unknown words
+        # of length 2 and >2. Unknown one-character words never change state.
+        self.emoticon_polarity = []
+        for (_, p), forms in EMOTICONS.items():
+            for e in forms:
+                e = e.lower()
+                if e not in self.index and not e.isalpha() and len(e) <= 5 and e not in _PATTERN_PUNCTUATION:
+                    self.index[e] = self.n_words + len(self.emoticon_polarity)
+                    self.emoticon_polarity.append((p, len(e)))
+        self.NEG2 = self.n_words + len(self.emoticon_polarity)
+        self.NEG3 = self.NEG2 + 1
+        self.UNK2 = self.NEG2 + 2
+        self.UNK3 = self.NEG2 + 3
+        for w in NEGATIONS:
+            self.index.setdefault(w, self.NEG2 if len(w) <= 2 else self.NEG3)
+
+    def _codes(self, token_lists):
+        """Relevant token codes per document, with no-op tokens dropped."""
+        lengths = [len(t) for t in token_lists]
+        tokens = [tok for toks in token_lists for tok in toks]
+        n = len(tokens)
+        codes = np.fromiter(map(self.index.get, tokens, repeat(-1, n)), dtype=np.int64, count=n)
+        unknown = codes < 0
+        if unknown.any():
+            tok_len = np.fromiter(map(len, tokens), dtype=np.int64, count=n)
+            codes[unknown & (tok_len == 2)] = self.UNK2
+            codes[unknown & (tok_len > 2)] = self.UNK3
+        doc = np.repeat(np.arange(len(token_lists)), lengths)
+        keep = codes >= 0
+        codes, doc = codes[keep], doc[keep]
+        # In a run of unknown words only the first two matter (the first clears
+        # a pending negation, the next clears a pending modifier)
+        dup = np.zeros(len(codes), dtype=bool)
+        dup[2:] = ((codes[2:] == codes[1:-1]) & (codes[1:-1] == codes[:-2])
+                   & (codes[2:] >= self.UNK2) & (doc[2:] == doc[:-2]))
+        codes, doc = codes[~dup], doc[~dup]
+        bounds = np.searchsorted(doc, np.arange(len(token_lists) + 1))
+        codes = codes.tolist()
+        return [codes[bounds[i]:bounds[i + 1]] for i in range(len(token_lists))]
+
+    def _score(self, codes) -> SentimentResult:
+        """Pattern's ``Sentiment.assessments`` over integer codes."""
+        pol, subj, inten = self.polarity, self.subjectivity, self.intensity
+        a = []  # [polarity, subjectivity, intensity, negated]
+        m = None  # preceding modifier (word code)
+        n = False  # preceding negation
+        n_words = self.n_words
+        for c in codes:
+            if c < n_words:
+                if m is None:
+                    a.append([pol[c], subj[c], inten[c], False])
+                else:
+                    last = a[-1]
+                    last[0] = max(-1.0, min(pol[c] * last[2], +1.0))
+                    last[1] = max(-1.0, min(subj[c] * last[2], +1.0))
+                    last[2] = inten[c]
+                if n:
+                    a[-1][2] = 1.0 / a[-1][2]
+                    a[-1][3] = True
+                m = c if self.is_modifier[c] else None
+                n = self.is_negation[c]
+                continue
+
+            if c == self.NEG2 or c == self.NEG3:
+                n = True
+                length = 2 if c == self.NEG2 else 3
+            else:
+                length = 2 if c == self.UNK2 else 3 if c == self.UNK3 else self.emoticon_polarity[c - n_words][1]
+                if n and length > 1:
+                    n = False
+            if n and m is not None and self.ends_ly[m]:
+                a[-1][3] = True
+                n = False
+            elif m is not None and length > 2:
+                m = None
+            if n_words <= c < self.NEG2:
+                a.append([self.emoticon_polarity[c - n_words][0], 1.0, 1.0, False])
+
+        if not a:
+            return SentimentResult(0.0, 0.0)
+        polarity = sum(p * -0.5 if neg else p for p, _, _, neg in a) / len(a)
+        subjectivity = sum(s for _, s, _, _ in a) / len(a)
+        return SentimentResult(polarity=float(polarity), subjectivity=float(subjectivity))
+
+    def score_batch(self, texts):
+        token_lists = [text.translate(_QUOTES).lower().split() if text else [] for text in texts]
+        return [self._score(codes) for codes in self._codes(token_lists)]
+
+
+_lexicon = None
+
+
+def get_lexicon() -> SentimentLexicon:
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = SentimentLexicon()
+    return _lexicon
+
+
+def _textblob_sentiment(text: str) -> SentimentResult:
+    from textblob import TextBlob
+
+    s = TextBlob(text).sentiment
+    return SentimentResult(polarity=float(s.polarity), subjectivity=float(s.subjectivity))
+
+
+def sentiment_features_batch(texts):
+    if SENTIMENT_ENGINE == "textblob":
+        return [_textblob_sentiment(t) if t else SentimentResult(0.0, 0.0) for t in texts]
+    return get_lexicon().score_batch(texts)
+
+
 def sentiment_features(text: str) -> SentimentResult:
     if not text:
         return SentimentResult(0.0, 0.0)
-    blob = TextBlob(text)
-    s = blob.sentiment
-    return SentimentResult(polarity=float(s.polarity), subjectivity=float(s.subjectivity))
\ No newline at end of file
+    return sentiment_features_batch([text])[0]
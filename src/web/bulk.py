@@ -0,0 +1,206 @@
+"""
+Bulk URL analysis: fetch thousands of articles politely and score them in batches.
+
+URLs are fetched on a pool of BULK_CONCURRENCY threads sharing the keep-alive
+session in ``src.utils.fetch``. Per host, at most BULK_PER_DOMAIN requests are
+in flight and consecutive requests start BULK_DOMAIN_INTERVAL seconds apart;
+URLs are interleaved by host so one slow site does not hold every thread.
+Connection errors, timeouts, 429 and 5xx responses are retried up to
+BULK_RETRIES times with jittered exponential backoff (or the server's
+Retry-After). Extracted texts are scored with ``predict_batch`` every
+BULK_BATCH_SIZE articles, as they arrive.
+
+Served as ``POST /analyze/bulk`` (NDJSON stream) and on the command line:
+
+    python -m src.web.bulk urls.txt --output results.jsonl
+    cat urls.txt | python -m src.web.bulk - > results.jsonl
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from itertools import zip_longest
+from urllib.parse import urlsplit
+
+from src.ml.pipeline import predict_batch
+from src.utils.fetch import extract_article_text
+
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", "16"))
+BULK_PER_DOMAIN = int(os.environ.get("BULK_PER_DOMAIN", "2"))
+BULK_DOMAIN_INTERVAL = float(os.environ.get("BULK_DOMAIN_INTERVAL", "0.5"))
+BULK_RETRIES = int(os.environ.get("BULK_RETRIES", "3"))
+BULK_BACKOFF = float(os.environ.get("BULK_BACKOFF", "0.5"))
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", "64"))
+BULK_MAX_URLS = int(os.environ.get("BULK_MAX_URLS", "5000"))
+MAX_BACKOFF = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DomainLimiter:
+    """At most ``per_domain`` requests in flight per host, started ``interval`` seconds apart."""
+
+    def __init__(self, per_domain: int = BULK_PER_DOMAIN, interval: float = BULK_DOMAIN_INTERVAL):
+        self.per_domain = per_domain
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._slots = defaultdict(lambda: threading.Semaphore(per_domain))
+        self._next_start = defaultdict(float)
+
+    @contextmanager
+    def slot(self, domain: str):
+        with self._lock:
+            semaphore = self._slots[domain]
+        with semaphore:
+            with self._lock:
+                # Reserve a start time so concurrent callers queue up behind each other
+                start = max(time.monotonic(), self._next_start[domain])
+                self._next_start[domain] = start + self.interval
+            delay = start - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield
+
+    def defer(self, domain: str, seconds: float):
+        """Start no request to ``domain`` for ``seconds`` (e.g. after a 429)."""
+        with self._lock:
+            self._next_start[domain] = max(self._next_start[domain], time.monotonic() + seconds)
+
+
+def _retry_delay(error: Exception, attempt: int, backoff: float):
+    """Seconds to wait before retrying after ``error``, or None if retrying cannot help."""
+    import requests
+
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        if response is None or response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+    elif not isinstance(error, (requests.ConnectionError, requests.Timeout,
+                                requests.exceptions.ChunkedEncodingError)):
+        return None
+    return min(backoff * 2 ** attempt, MAX_BACKOFF) * random.uniform(1.0, 1.5)
+
+
+def fetch_with_retries(url: str, limiter: DomainLimiter, retries: int = BULK_RETRIES,
+                       backoff: float = BULK_BACKOFF, on_retry=None) -> str:
+    """``extract_article_text`` under the host's politeness limits, retrying transient failures."""
+    domain = urlsplit(url).hostname or ""
+    for attempt in range(retries + 1):
+        try:
+            with limiter.slot(domain):
+                return extract_article_text(url, raise_errors=True)
+        except Exception as e:
+            delay = _retry_delay(e, attempt, backoff)
+            if delay is None or attempt == retries:
+                raise
+            print(f"⚠️  {url}: {e} (attempt {attempt + 1}/{retries + 1}, retrying in {delay:.1f}s)")
+            limiter.defer(domain, delay)
+            if on_retry:
+                on_retry()
+            time.sleep(delay)
+
+
+def _interleave_domains(urls):
+    """Round-robin over hosts, keeping each host's URLs in their original order."""
+    by_domain = defaultdict(list)
+    for url in urls:
+        by_domain[urlsplit(url).hostname or ""].append(url)
+    return [url for group in zip_longest(*by_domain.values()) for url in group if url is not None]
+
+
+def analyze_urls(urls, concurrency: int = BULK_CONCURRENCY, per_domain: int = BULK_PER_DOMAIN,
+                 interval: float = BULK_DOMAIN_INTERVAL, retries: int = BULK_RETRIES,
+                 backoff: float = BULK_BACKOFF, batch_size: int = BULK_BATCH_SIZE, stats: dict = None):
+    """Fetch ``urls`` and score them, yielding ``{"url", "result"}`` or ``{"url", "error"}`` per URL.
+
+    Results come in completion order, scored ``batch_size`` at a time. ``stats``,
+    if given, is kept up to date with counts, elapsed seconds and pages/second.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(urls=len(urls), fetched=0, failed=0, retries=0, seconds=0.0, pages_per_s=0.0)
+    stats_lock = threading.Lock()
+    start = time.perf_counter()
+
+    def count(key=None):
+        with stats_lock:
+            if key:
+                stats[key] += 1
+            stats["seconds"] = time.perf_counter() - start
+            stats["pages_per_s"] = stats["fetched"] / stats["seconds"] if stats["seconds"] else 0.0
+
+    def score(batch):
+        try:
+            scored = predict_batch([text for _, text in batch])
+        except Exception as e:
+            print(f"Bulk prediction error: {str(e)}")
+            return [{"url": url, "error": f"Analysis failed: {str(e)}"} for url, _ in batch]
+        return [{"url": url, "result": result} for (url, _), result in zip(batch, scored)]
+
+    limiter = DomainLimiter(per_domain, interval)
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="bulk-fetch")
+    try:
+        futures = {pool.submit(fetch_with_retries, url, limiter, retries, backoff, lambda: count("retries")): url
+                   for url in _interleave_domains(urls)}
+        batch = []
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                text = future.result()
+            except Exception as e:
+                text, error = "", str(e)
+            else:
+                error = "Could not extract text from URL"
+            if not text:
+                count("failed")
+                yield {"url": url, "error": error}
+                continue
+            count("fetched")
+            batch.append((url, text))
+            if len(batch) >= batch_size:
+                yield from score(batch)
+                batch = []
+        if batch:
+            yield from score(batch)
+    finally:
+        # A consumer that stops early (e.g. a client disconnect) abandons the queue
+        pool.shutdown(wait=False, cancel_futures=True)
+        count()
+
+
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+    import json
+
+    parser = argparse.ArgumentParser(description="Fetch and score a list of article URLs")
+    parser.add_argument("input", help="File with one URL per line, or - for stdin")
+    parser.add_argument("--output", default="-", help="JSONL file, or - for stdout (default)")
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY)
+    parser.add_argument("--per_domain", type=int, default=BULK_PER_DOMAIN)
+    parser.add_argument("--interval", type=float, default=BULK_DOMAIN_INTERVAL,
+                        help="Seconds between request starts to one host")
+    parser.add_argument("--retries", type=int, default=BULK_RETRIES)
+    parser.add_argument("--batch_size", type=int, default=BULK_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with (sys.stdin if args.input == "-" else open(args.input)) as f:
+        urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    stats = {}
+    last_log = time.perf_counter()
+    # Fetch and model logs go to stderr so stdout carries only results
+    with out, contextlib.redirect_stdout(sys.stderr):
+        for row in analyze_urls(urls, args.concurrency, args.per_domain, args.interval, args.retries,
+                                batch_size=args.batch_size, stats=stats):
+            out.write(json.dumps(row) + "\n")
+            if time.perf_counter() - last_log >= 10:
+                print(f"{stats['fetched'] + stats['failed']}/{len(urls)} URLs, {stats['pages_per_s']:.1f} pages/s")
+                last_log = time.perf_counter()
+    print(f"✅ {stats['fetched']} pages fetched, {stats['failed']} failed, {stats['retries']} retries "
+          f"in {stats['seconds']:.1f}s ({stats['pages_per_s']:.1f} pages/s)", file=sys.stderr)
@@ -1,19 +1,105 @@
+import json
 import os
-from flask import Blueprint, render_template, request, jsonify
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import Blueprint, Response, g, render_template, request, jsonify, stream_with_context
 
-from src.utils.fetch import extract_article_text
-from src.utils.search import web_corroborate
-from src.ml.pipeline import predict, train_model
+from src.utils.fetch import extract_article_text, cache_stats as fetch_cache_stats
+from src.utils.search import web_corroborate, cache_stats as search_cache_stats
+from src.ml.pipeline import get_serving_model, model_loaded, predict, predict_batch, segment_text
+from src.utils.near_duplicates import get_index as near_duplicate_index
+from src.utils.preprocess import clean_text
+from src.ml import train_jobs
+from src.utils import metrics
 
 web_bp = Blueprint("web", __name__, template_folder="templates")
 
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "500"))
+BATCH_FETCH_WORKERS = int(os.environ.get("BATCH_FETCH_WORKERS", "8"))
+
+# Per-stage deadlines (seconds) for /analyze. A stage that misses its deadline
+# keeps running in the pool but the request returns without it.
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "15"))
+PREDICT_TIMEOUT = float(os.environ.get("PREDICT_TIMEOUT", "10"))
+CORROBORATE_TIMEOUT = float(os.environ.get("CORROBORATE_TIMEOUT", "8"))
+
+_stage_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ANALYZE_STAGE_WORKERS", "16")),
+    thread_name_prefix="analyze-stage",
+)
+
+
+def _wait(future, deadline: float):
+    """Return the future's result, or raise FutureTimeout once ``deadline`` (monotonic) passes."""
+    return future.result(timeout=max(deadline - time.monotonic(), 0))
+
+
+def _near_duplicate(text: str, explain: bool):
+    """Look ``text`` up in the near-duplicate index.
+
+    Returns (``(signature, model fingerprint)`` to store the new analysis
+    under, stored response of a near-duplicate or None); the key is None when
+    there is no index, no model loaded yet or the text is too short to match. Explained requests
+    are never answered from the index: an explanation lists the n-grams of
+    the text it was computed for.
+    """
+    index = near_duplicate_index()
+    # Before the model is loaded there is nothing to match against, and loading
+    # it here would bypass PREDICT_TIMEOUT: the predict stage does that
+    if index is None or not model_loaded():
+        return None, None
+    # The fingerprint, unlike the version, also identifies flat (unversioned) artifacts
+    fingerprint = get_serving_model().fingerprint
+    with metrics.time_stage("near_duplicate"):
+        # Only the part that gets scored: bounds the cost, and it is all the verdict depends on
+        sig = index.signature(clean_text("\n".join(segment_text(text))))
+        hit = index.lookup(sig, fingerprint) if sig is not None and not explain else None
+    if sig is None:
+        return None, None
+    if hit is None:
+        return (sig, fingerprint), None
+    print(f"Near-duplicate of an article analyzed before (similarity {hit['similarity']:.2f})")
+    response = _without_explanation(hit["value"])
+    response["near_duplicate"] = {"similarity": hit["similarity"], "analyzed_at": hit["stored_at"]}
+    return (sig, fingerprint), response
+
+
+def _without_explanation(response: dict) -> dict:
+    result = {k: v for k, v in response["result"].items() if k != "explanation"}
+    return {**response, "result": result}
+
+@web_bp.before_request
+def _start_request_metrics():
+    g.metrics_endpoint = request.endpoint or "unknown"
+    g.metrics_start = time.perf_counter()
+    metrics.IN_FLIGHT.inc(g.metrics_endpoint)
+
+
+@web_bp.teardown_request
+def _finish_request_metrics(exc):
+    endpoint = g.pop("metrics_endpoint", None)
+    if endpoint is not None:
+        metrics.IN_FLIGHT.dec(endpoint)
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.pop("metrics_start"), endpoint)
+
 @web_bp.route("/")
 def index():
     return render_template("index.html")
 
 @web_bp.route("/health")
 def health():
-    return jsonify({"status": "ok"}), 200
+    # Answers immediately: never loads the model or touches the network
+    return jsonify({"status": "ok", "model_loaded": model_loaded()}), 200
+
+@web_bp.route("/cache/stats")
+def cache_stats():
+    index = near_duplicate_index()
+    return jsonify({"article_text": fetch_cache_stats(), "corroboration": search_cache_stats(),
+                    "near_duplicate": index.stats() if index is not None else None}), 200
+
+@web_bp.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @web_bp.route("/analyze", methods=["POST"])
 def analyze():
@@ -21,37 +107,174 @@ def analyze():
     url = data.get("url")
     text = data.get("text")
     mode = data.get("mode", "url")
+    explain = data.get("explain", False)
+    if not isinstance(explain, bool):
+        return jsonify({"error": "'explain' must be true or false"}), 400
 
     print(f"Analyze request - Mode: {mode}, URL: {url}, Text length: {len(text) if text else 0}")
 
+    start = time.monotonic()
+    timed_out = []
+
+    # Corroboration only needs the query, so it starts before fetch/prediction
     if mode == "url":
         if not url:
             return jsonify({"error": "No URL provided"}), 400
-        
-        article_text = extract_article_text(url)
         query = url
-        
-        if not article_text:
-            return jsonify({"error": "Could not extract text from URL. The website may be blocking access or the URL may be invalid."}), 400
     else:
         article_text = text or ""
-        query = article_text[:160]
-        
         if not article_text:
             return jsonify({"error": "No text provided for analysis"}), 400
+        query = article_text[:160]
+        near_dup_key, duplicate = _near_duplicate(article_text, explain)
+        if duplicate is not None:
+            return jsonify(duplicate)
+    corroboration_future = _stage_pool.submit(web_corroborate, query, timeout=max(int(CORROBORATE_TIMEOUT), 1))
+
+    def corroboration_so_far():
+        try:
+            return _wait(corroboration_future, start + CORROBORATE_TIMEOUT)
+        except FutureTimeout:
+            timed_out.append("corroboration")
+            return []
+
+    if mode == "url":
+        try:
+            article_text = _wait(_stage_pool.submit(extract_article_text, url), start + FETCH_TIMEOUT)
+        except FutureTimeout:
+            print(f"Fetch timed out after {FETCH_TIMEOUT}s: {url}")
+            return jsonify({
+                "error": "Timed out fetching the article.",
+                "corroboration": corroboration_so_far(),
+                "timed_out": ["fetch"] + timed_out,
+            }), 504
+
+        if not article_text:
+            return jsonify({"error": "Could not extract text from URL. The website may be blocking access or the URL may be invalid."}), 400
+        # Only fetch could not be skipped: corroboration finishes in the background
+        near_dup_key, duplicate = _near_duplicate(article_text, explain)
+        if duplicate is not None:
+            return jsonify(duplicate)
 
     try:
-        result = predict(article_text)
-        corroboration = web_corroborate(query)
-        return jsonify({"result": result, "corroboration": corroboration})
+        result = _wait(_stage_pool.submit(predict, article_text, explain), time.monotonic() + PREDICT_TIMEOUT)
+    except FutureTimeout:
+        print(f"Prediction timed out after {PREDICT_TIMEOUT}s")
+        return jsonify({
+            "error": "Timed out scoring the article.",
+            "corroboration": corroboration_so_far(),
+            "timed_out": ["predict"] + timed_out,
+        }), 504
     except Exception as e:
         print(f"Prediction error: {str(e)}")
         return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
 
-@web_bp.route("/train", methods=["POST"])  # Simple endpoint to train using sample dataset
+    corroboration = corroboration_so_far()
+    response = {"result": result, "corroboration": corroboration}
+    if timed_out:
+        response["timed_out"] = timed_out
+    elif near_dup_key is not None:
+        signature, fingerprint = near_dup_key
+        near_duplicate_index().add(signature, _without_explanation(response), fingerprint)
+    return jsonify(response)
+
+@web_bp.route("/analyze/batch", methods=["POST"])
+def analyze_batch():
+    """Score many texts and/or URLs in one request.
+
+    Body: ``{"texts": [...], "urls": [...]}``. URLs are fetched concurrently,
+    then everything that yielded text is scored with a single
+    ``predict_batch`` call. Corroboration is not run for batches.
+    """
+    data = request.get_json(force=True) or {}
+    texts = data.get("texts") or []
+    urls = data.get("urls") or []
+    if not isinstance(texts, list) or not isinstance(urls, list):
+        return jsonify({"error": "'texts' and 'urls' must be lists"}), 400
+    if not all(isinstance(t, str) and t for t in texts):
+        return jsonify({"error": "Every item in 'texts' must be a non-empty string"}), 400
+    if not all(isinstance(u, str) and u for u in urls):
+        return jsonify({"error": "Every item in 'urls' must be a non-empty string"}), 400
+
+    items = [{"source": "text", "text": t} for t in texts]
+    items += [{"source": "url", "url": u} for u in urls]
+    if not items:
+        return jsonify({"error": "No texts or URLs provided"}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Batch too large (max {MAX_BATCH_SIZE} items)"}), 400
+
+    print(f"Analyze batch request - Texts: {len(texts)}, URLs: {len(urls)}")
+
+    if urls:
+        with ThreadPoolExecutor(max_workers=min(BATCH_FETCH_WORKERS, len(urls))) as pool:
+            fetched = list(pool.map(extract_article_text, urls))
+        for item, article_text in zip(items[len(texts):], fetched):
+            item["text"] = article_text
+
+    scorable = [i for i, item in enumerate(items) if item["text"]]
+    try:
+        scored = predict_batch([items[i]["text"] for i in scorable])
+    except Exception as e:
+        print(f"Batch prediction error: {str(e)}")
+        return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
+
+    results = []
+    for item in items:
+        entry = {"source": item["source"]}
+        if item["source"] == "url":
+            entry["url"] = item["url"]
+        results.append(entry)
+    for i, result in zip(scorable, scored):
+        results[i]["result"] = result
+    for entry, item in zip(results, items):
+        if "result" not in entry:
+            entry["error"] = "Could not extract text from URL"
+    return jsonify({"results": results})
+
+@web_bp.route("/analyze/bulk", methods=["POST"])
+def analyze_bulk():
+    """Fetch and score up to BULK_MAX_URLS URLs, streaming results as NDJSON.
+
+    Body: ``{"urls": [...]}``. One line per URL as it is scored (completion
+    order), ``{"url", "result"}`` or ``{"url", "error"}``, then a final
+    ``{"summary": {...}}`` line with counts and pages/second.
+    """
+    # Imported here: the bulk fetcher is not on the single-article path
+    from src.web.bulk import BULK_MAX_URLS, analyze_urls
+
+    data = request.get_json(force=True) or {}
+    urls = data.get("urls")
+    if not isinstance(urls, list) or not all(isinstance(u, str) and u for u in urls):
+        return jsonify({"error": "'urls' must be a list of URLs"}), 400
+    if not urls:
+        return jsonify({"error": "No URLs provided"}), 400
+    if len(urls) > BULK_MAX_URLS:
+        return jsonify({"error": f"Too many URLs (max {BULK_MAX_URLS})"}), 400
+
+    print(f"Analyze bulk request - URLs: {len(urls)}")
+
+    def lines():
+        stats = {}
+        for row in analyze_urls(urls, stats=stats):
+            yield json.dumps(row) + "\n"
+        yield json.dumps({"summary": stats}) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+@web_bp.route("/train", methods=["POST"])
 def trigger_train():
+    """Queue a training run; poll ``/train/<job_id>`` for its progress."""
     try:
-        train_model()
-        return jsonify({"status": "trained"})
+        job = train_jobs.submit()
+    except train_jobs.TrainQueueFullError as e:
+        return jsonify({"error": str(e)}), 429
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    return jsonify({"job_id": job["id"], "status": job["status"], "status_url": f"/train/{job['id']}"}), 202
+
+@web_bp.route("/train/<job_id>")
+def train_status(job_id):
+    job = train_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown training job"}), 404
+    return jsonify(job), 200
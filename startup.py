@@ -16,8 +16,8 @@ def ensure_models_downloaded():
         "tfidf_char_vectorizer.pkl"
     ]
     
-    # Check if all models exist
-    all_exist = all((artifacts_dir / f).exists() for f in required_files)
+    # Check if all models exist (a trained version in the registry counts too)
+    all_exist = all((artifacts_dir / f).exists() for f in required_files) or (artifacts_dir / "ACTIVE").exists()
     
     if not all_exist:
         print("=" * 60)
@@ -0,0 +1,8 @@
+"""``import app`` must stay fast and free of training/fetch-only dependencies."""
+from src.scripts.benchmark import IMPORT_BUDGET_S, check_import_budget
+
+
+def test_import_app_within_budget():
+    r = check_import_budget(IMPORT_BUDGET_S)
+    assert not r["heavy_modules_loaded"], f"import app loaded {', '.join(r['heavy_modules_loaded'])}"
+    assert r["import_s"] <= r["budget_s"], f"import app took {r['import_s']:.2f}s (budget {r['budget_s']:.2f}s)"
@@ -0,0 +1,16 @@
+"""Input handling of the offline batch scorer."""
+import io
+import sys
+
+from src.ml.scoring import _open, read_records
+
+
+def test_read_records_coerces_non_string_text():
+    f = io.StringIO('{"text": 12}\n{"text": null}\n{"id": "a", "text": "words"}\n{}\n')
+    assert list(read_records(f, "jsonl")) == [(0, "12"), (1, ""), (2, "words"), (3, "")]
+
+
+def test_open_leaves_stdio_open():
+    with _open("-", "r") as fin, _open("-", "w") as fout:
+        assert fin is sys.stdin and fout is sys.stdout
+    assert not sys.stdin.closed and not sys.stdout.closed
@@ -0,0 +1,13 @@
+"""The lexicon sentiment scorer must give TextBlob's scores on ``clean_text`` output."""
+import pytest
+
+pytest.importorskip("textblob")
+
+from src.scripts.benchmark import SENTIMENT_PARITY_TOLERANCE, check_sentiment_parity
+
+
+def test_lexicon_matches_textblob_on_reference_corpus():
+    r = check_sentiment_parity(SENTIMENT_PARITY_TOLERANCE)
+    assert r["n_texts"] > 10000
+    assert r["passed"], (f"{r['mismatches']} of {r['n_texts']} texts differ from TextBlob by more than "
+                         f"{r['tolerance']:.0e} (max {r['max_abs_diff']:.2e}), e.g. {r['examples']}")